@@ -1,17 +1,39 @@
 #!/usr/bin/env python3
-import os, sqlite3, secrets, smtplib, base64
+import os, re, json, hmac, mimetypes, sqlite3, secrets, smtplib, base64, hashlib, threading, gzip, zlib, time, logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import namedtuple
+from functools import lru_cache, cached_property
+from array import array
+from bisect import bisect_left
 from email.message import EmailMessage
 from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
 from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
-from urllib.parse import urlencode
+from urllib.parse import urlparse, parse_qs
 
-from flask import Flask, request, redirect, url_for, make_response, render_template_string, abort, send_from_directory, session
+from flask import Flask, Response, stream_with_context, stream_template, request, redirect, url_for, make_response, render_template, abort, send_from_directory, session
 from dotenv import load_dotenv
+from markupsafe import Markup, escape
+from jinja2 import FileSystemBytecodeCache
+from werkzeug.security import safe_join
 
+from google.auth.exceptions import RefreshError
+from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.errors import HttpError
+from googleapiclient.model import JsonModel
+
+try:
+    import orjson  # optional: faster parsing of Google API responses
+except ImportError:
+    orjson = None
+
+# JSON decoding for config blobs; orjson.JSONDecodeError subclasses ValueError
+json_loads = orjson.loads if orjson else json.loads
 
 # Allow HTTP for local development
 os.environ['OAUTHLIB_INSECURE_TRANSPORT'] = '1'
@@ -34,31 +56,164 @@ SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
 SMTP_USER = os.getenv("SMTP_USER", "")
 SMTP_PASS = os.getenv("SMTP_PASS", "")
 SMTP_FROM = os.getenv("SMTP_FROM", "User Study <no-reply@example.com>")
+# Parallel sends when emailing a batch of participants
+EMAIL_WORKERS = int(os.getenv("EMAIL_WORKERS", "8"))
+# Follow-up work (notification emails) that runs after the response is sent
+BACKGROUND_WORKERS = int(os.getenv("BACKGROUND_WORKERS", "4"))
+BACKGROUND_QUEUE_MAX = 64
 
 SCOPES = ["https://www.googleapis.com/auth/calendar"]
+# Admin sign-in: calendar plus Gmail sending and the identity scopes
+ADMIN_SCOPES = [
+    "https://www.googleapis.com/auth/calendar",
+    "https://www.googleapis.com/auth/gmail.send",
+    "https://www.googleapis.com/auth/userinfo.email",
+    "https://www.googleapis.com/auth/userinfo.profile",
+    "openid"
+]
 
 DBPATH = os.getenv("DB_PATH", "study.db")
 UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", "uploads")
 ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx'}
+UPLOAD_COPY_BUFFER = 1024 * 1024
 
 app = Flask(__name__)
+_log = logging.getLogger(__name__)
 app.secret_key = os.getenv("FLASK_SECRET", secrets.token_hex(16))
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB limit
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 31536000  # static/ assets are versioned by asset_url()
+# Behind nginx/Apache, hand file bodies to the front server via X-Sendfile
+app.config['USE_X_SENDFILE'] = os.getenv("USE_X_SENDFILE", "False").lower() == "true"
+# Compiled templates are kept on disk so a fresh worker skips re-parsing them,
+# and are only re-checked for edits when debugging
+# (Jinja's default directory is a per-user, owner-checked 0700 one under the temp dir)
+JINJA_CACHE_DIR = os.getenv("JINJA_CACHE_DIR", "")
+if JINJA_CACHE_DIR:
+    os.makedirs(JINJA_CACHE_DIR, mode=0o700, exist_ok=True)
+app.jinja_options = {**app.jinja_options, "bytecode_cache": FileSystemBytecodeCache(JINJA_CACHE_DIR or None),
+                     "cache_size": 400}
+app.config['TEMPLATES_AUTO_RELOAD'] = os.getenv("FLASK_DEBUG", "False").lower() == "true"
+
+# Server-side sessions in Redis when REDIS_URL is set and Flask-Session is
+# installed, so the cookie carries only a session id; otherwise signed cookies
+REDIS_URL = os.getenv("REDIS_URL", "")
+if REDIS_URL:
+    try:
+        import redis
+        from flask_session import Session
+    except ImportError:
+        print("[SESSION] REDIS_URL is set but flask-session/redis aren't installed; using cookie sessions")
+    else:
+        app.config['SESSION_TYPE'] = "redis"
+        app.config['SESSION_REDIS'] = redis.Redis.from_url(REDIS_URL)
+        Session(app)
 
 # Create uploads directory
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# gzip rendered pages; static files are served from the .br/.gz copies that
+# deploy.py writes next to them, when present
+COMPRESS_MIMETYPES = {"text/html", "text/css", "application/javascript"}
+COMPRESS_MIN_SIZE = 512
+COMPRESS_LEVEL = 6
+
+def gzip_stream(chunks):
+    """gzip a streamed body piece by piece, flushing each piece so it still reaches the client early"""
+    z = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            if chunk:
+                yield z.compress(chunk) + z.flush(zlib.Z_SYNC_FLUSH)
+        yield z.flush()
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+_STATIC_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+def static_file(filename):
+    """Flask's static view, but preferring a precompressed sibling the client accepts"""
+    accept = request.headers.get("Accept-Encoding", "")
+    for encoding, suffix in _STATIC_ENCODINGS:
+        if encoding not in accept:
+            continue
+        path = safe_join(app.static_folder, filename + suffix)
+        if path and os.path.isfile(path):
+            response = send_from_directory(app.static_folder, filename + suffix,
+                                           mimetype=mimetypes.guess_type(filename)[0])
+            response.headers["Content-Encoding"] = encoding
+            response.vary.add("Accept-Encoding")
+            return response
+    return app.send_static_file(filename)
+
+app.view_functions["static"] = static_file
+
+@app.after_request
+def compress_response(response):
+    if (response.direct_passthrough
+            or response.status_code != 200
+            or response.mimetype not in COMPRESS_MIMETYPES
+            or "Content-Encoding" in response.headers
+            or "gzip" not in request.headers.get("Accept-Encoding", "")):
+        return response
+    if response.is_streamed:
+        response.response = gzip_stream(response.response)
+        response.headers.pop("Content-Length", None)
+        response.headers["Content-Encoding"] = "gzip"
+        response.vary.add("Accept-Encoding")
+        return response
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_SIZE:
+        return response
+    response.set_data(gzip.compress(body, compresslevel=COMPRESS_LEVEL))
+    response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept-Encoding")
+    return response
+
 # ──────────────────────────────────────────────────────────────────────────────
 # DB
 # ──────────────────────────────────────────────────────────────────────────────
+# Each thread keeps one open connection; `with db() as con` still commits or
+# rolls back per block. The pid check stops a forked worker from reusing its
+# parent's handle.
+_db_local = threading.local()
+
 def db():
-    conn = sqlite3.connect(DBPATH)
+    conn = getattr(_db_local, "conn", None)
+    if conn is not None and _db_local.pid == os.getpid():
+        return conn
+    # timeout is SQLite's busy timeout: wait up to 5s for a writer's lock
+    conn = sqlite3.connect(DBPATH, timeout=5)
     conn.row_factory = sqlite3.Row
+    # WAL is durable across commits with NORMAL sync; only a power loss can drop the last ones
+    conn.executescript("""
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-20000;
+    """)
+    _db_local.conn = conn
+    _db_local.pid = os.getpid()
     return conn
 
+@app.teardown_request
+def release_db_transaction(exc):
+    # The thread's connection outlives the request, so it must not carry an open
+    # transaction (and its write lock) into the next one
+    conn = getattr(_db_local, "conn", None)
+    if conn is not None and conn.in_transaction:
+        print("[DB] Rolling back a transaction left open by the request")
+        conn.rollback()
+
+DEFAULT_EMAIL_BODY = "Hi {{name}},\\n\\nThank you for volunteering to participate in our user study at Synlab (Toronto Metropolitan University)!\\n\\nWe are conducting a user study under the supervision of Professor Ali Mazalek to evaluate the efficiency of tangibles. Your participation will help advance our research.\\n\\nPlease access our interactive calendar and select your preferred time slot:\\n\\nCALENDAR LINK: {{link}}\\n\\nThis will take you to our availability calendar where you can see all open time slots."
+DEFAULT_CONSENT_HTML = "<h2>Consent Form</h2><p>Please read this consent carefully before booking. You agree to participate voluntarily. Contact us with any questions.</p>"
+
 def init_db():
     with db() as con:
+        # Readers no longer block on writers (persists in the database file)
+        con.execute("PRAGMA journal_mode=WAL")
         con.executescript("""
         CREATE TABLE IF NOT EXISTS settings (
             k TEXT PRIMARY KEY,
@@ -99,16 +254,12 @@ def init_db():
             end_time TEXT NOT NULL,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         );
+        CREATE INDEX IF NOT EXISTS idx_blocked_slots_start_end ON blocked_slots(start_time, end_time);
+        CREATE INDEX IF NOT EXISTS idx_consent_upload_date ON consent_files(upload_date DESC, id DESC);
         """)
         # defaults
-        if not con.execute("SELECT 1 FROM settings WHERE k='email_body'").fetchone():
-            con.execute("INSERT INTO settings(k,v) VALUES(?,?)",
-                        ("email_body",
-                         "Hi {{name}},\\n\\nThank you for volunteering to participate in our user study at Synlab (Toronto Metropolitan University)!\\n\\nWe are conducting a user study under the supervision of Professor Ali Mazalek to evaluate the efficiency of tangibles. Your participation will help advance our research.\\n\\nPlease access our interactive calendar and select your preferred time slot:\\n\\nCALENDAR LINK: {{link}}\\n\\nThis will take you to our availability calendar where you can see all open time slots."))
-        if not con.execute("SELECT 1 FROM settings WHERE k='consent_html'").fetchone():
-            con.execute("INSERT INTO settings(k,v) VALUES(?,?)",
-                        ("consent_html",
-                         "<h2>Consent Form</h2><p>Please read this consent carefully before booking. You agree to participate voluntarily. Contact us with any questions.</p>"))
+        con.executemany("INSERT OR IGNORE INTO settings(k,v) VALUES(?,?)",
+                        [("email_body", DEFAULT_EMAIL_BODY), ("consent_html", DEFAULT_CONSENT_HTML)])
 
         # Update existing email template to include Synlab branding
         con.execute("UPDATE settings SET v=? WHERE k='email_body'",
@@ -158,39 +309,282 @@ def init_db():
         except Exception as e:
             print(f"[DB MIGRATION] {e}")  # Non-fatal migration error
 
+        # At most one confirmed booking per start time; approvals and direct
+        # bookings racing for the same slot get an IntegrityError instead
+        try:
+            con.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS ux_bookings_confirmed_slot
+            ON bookings(selected_start_time) WHERE status = 'confirmed'
+            """)
+        except sqlite3.Error as e:
+            print(f"[DB MIGRATION] Could not add confirmed-slot index (duplicate confirmed bookings?): {e}")
+
+        # Pending list (status + created_at order) and booking -> participant joins;
+        # created after the migration above, which may recreate the bookings table
+        con.executescript("""
+        CREATE INDEX IF NOT EXISTS idx_bookings_status_created ON bookings(status, created_at);
+        CREATE INDEX IF NOT EXISTS idx_bookings_participant ON bookings(participant_id);
+        ANALYZE;
+        """)
+
 init_db()
 
+# Settings only change through set_setting(), so reads are served from memory
+# (the Procfile runs a single gunicorn worker process)
+_settings_cache = {}
+_settings_lock = threading.Lock()
+
 def get_setting(key):
-    with db() as con:
-        r = con.execute("SELECT v FROM settings WHERE k=?", (key,)).fetchone()
-        return r["v"] if r else ""
+    val = _settings_cache.get(key)
+    if val is None:
+        with db() as con:
+            r = con.execute("SELECT v FROM settings WHERE k=?", (key,)).fetchone()
+        val = r["v"] if r else ""
+        with _settings_lock:
+            _settings_cache.setdefault(key, val)
+    return val
 
 def set_setting(key, val):
-    with db() as con:
-        con.execute("INSERT INTO settings(k,v) VALUES(?,?) ON CONFLICT(k) DO UPDATE SET v=excluded.v", (key, val))
+    with _settings_lock:
+        with db() as con:
+            con.execute("INSERT INTO settings(k,v) VALUES(?,?) ON CONFLICT(k) DO UPDATE SET v=excluded.v", (key, val))
+        _settings_cache[key] = val
+
+for _key in ("email_body", "consent_html"):
+    get_setting(_key)  # warm the cache with the defaults init_db() wrote
+
+RANDOM_POOL_SIZE = 4096
+_rand_local = threading.local()
+
+def _reset_rand_pool():
+    global _rand_local
+    _rand_local = threading.local()  # a forked worker must never reuse its parent's bytes
+
+os.register_at_fork(after_in_child=_reset_rand_pool)
+
+def rand_bytes(n):
+    """Return n bytes from os.urandom, drawn from a per-thread pool to save a syscall per token"""
+    buf = getattr(_rand_local, "buf", b"")
+    if len(buf) < n:
+        buf = os.urandom(max(RANDOM_POOL_SIZE, n))
+    _rand_local.buf = buf[n:]
+    return buf[:n]
+
+def new_token(nbytes=16):
+    """Same shape as secrets.token_urlsafe(nbytes)"""
+    return base64.urlsafe_b64encode(rand_bytes(nbytes)).rstrip(b"=").decode("ascii")
+
+def generate_tokens(count, nbytes=16):
+    """Return count tokens shaped like secrets.token_urlsafe(nbytes), cut from one random draw"""
+    raw = rand_bytes(nbytes * count)
+    return [base64.urlsafe_b64encode(raw[i:i + nbytes]).rstrip(b"=").decode("ascii")
+            for i in range(0, len(raw), nbytes)]
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def get_consent_files():
+CONSENT_FILES_PAGE = 50
+
+def get_consent_files(limit=CONSENT_FILES_PAGE, before=None):
+    """Newest consent files first, one page at a time; before is the id of the last file already shown"""
     with db() as con:
-        return con.execute("SELECT * FROM consent_files ORDER BY upload_date DESC").fetchall()
+        if before is None:
+            return con.execute(
+                "SELECT id, filename, original_name, upload_date FROM consent_files "
+                "ORDER BY upload_date DESC, id DESC LIMIT ?", (limit,)).fetchall()
+        return con.execute(
+            "SELECT id, filename, original_name, upload_date FROM consent_files "
+            "WHERE (upload_date, id) < (SELECT upload_date, id FROM consent_files WHERE id = ?) "
+            "ORDER BY upload_date DESC, id DESC LIMIT ?", (before, limit)).fetchall()
+
+# ?msg= codes the admin actions redirect with, and the banner shown for each
+ADMIN_MESSAGES = {
+    "email_saved": "Email template saved successfully!",
+    "consent_saved": "Consent form saved successfully!",
+    "file_uploaded": "Consent file uploaded successfully!",
+    "no_file": "Please select a file to upload.",
+    "invalid_file": "Invalid file type. Please upload PDF, DOC, or DOCX files.",
+    "booking_approved": "Booking approved and calendar invitation sent!",
+    "booking_rejected": "Booking rejected successfully.",
+    "booking_removed": "Confirmed booking removed successfully. Calendar event deleted and participant notified.",
+    "booking_not_found": "Booking not found or not confirmed.",
+    "removal_failed": "Failed to remove booking. Please try again.",
+    "direct_booking_success": "Participant booked successfully! Google Calendar invite has been sent.",
+    "direct_booking_failed": "Failed to create booking. Please try again.",
+    "missing_fields": "Please fill in all required fields.",
+    "invalid_time_range": "End time must be after start time.",
+    "slot_taken": "That time slot is already confirmed for another participant.",
+}
+
+# Changes on restart, so a new deploy's page isn't served from a stale validator
+_ADMIN_PAGE_BOOT = secrets.token_hex(8)
+
+def admin_page_etag(*parts):
+    """Validator for the admin page: changes whenever the bookings, consent files or settings it shows do"""
+    with db() as con:
+        bookings = con.execute(
+            "SELECT group_concat(id || ':' || status || ':' || ifnull(selected_start_time, '') || ':' "
+            "|| ifnull(calendar_event_id, ''), ',') FROM bookings WHERE status IN ('pending', 'confirmed')"
+        ).fetchone()[0]
+        newest_file = con.execute("SELECT max(id) FROM consent_files").fetchone()[0]
+    h = hashlib.blake2b(digest_size=16)
+    for part in (_ADMIN_PAGE_BOOT, bookings, newest_file, get_setting("email_body"), get_setting("consent_html"), *parts):
+        h.update(repr(part).encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+def admin_page_response(body, etag, status=200):
+    # Always revalidate (admin actions redirect back here), but let a matching ETag answer 304
+    response = make_response(body, status)
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+# Read-only view of a booking row plus its display strings, as used by templates/admin.html
+BookingView = namedtuple(
+    "BookingView",
+    "id name email calendar_event_id preferences created_at_formatted "
+    "confirmed_at_formatted start_formatted end_formatted",
+    defaults=(None, "", "", "", ""),
+)
+
+# Display labels built by SQLite from the wall-clock fields of stored ISO
+# timestamps (never converting them to UTC), matching SLOT_START_FMT etc.
+_SQL_WEEKDAYS = "SunMonTueWedThuFriSat"
+_SQL_MONTHS = "JanFebMarAprMayJunJulAugSepOctNovDec"
+
+def _sql_clock(col, pad_hour=False):
+    hour = f"((CAST(substr({col}, 12, 2) AS INTEGER) + 11) % 12 + 1)"
+    if pad_hour:
+        hour = f"printf('%02d', {hour})"
+    return f"{hour} || substr({col}, 14, 3) || CASE WHEN substr({col}, 12, 2) < '12' THEN ' AM' ELSE ' PM' END"
+
+def sql_slot_start_label(col):
+    """SQL expression for 'Mon Mar 9, 9:00 AM'"""
+    return (f"substr('{_SQL_WEEKDAYS}', strftime('%w', substr({col}, 1, 10)) * 3 + 1, 3) || ' ' || "
+            f"substr('{_SQL_MONTHS}', substr({col}, 6, 2) * 3 - 2, 3) || ' ' || "
+            f"CAST(substr({col}, 9, 2) AS INTEGER) || ', ' || {_sql_clock(col)}")
+
+def sql_slot_end_label(col):
+    """SQL expression for '10:00 AM'"""
+    return _sql_clock(col, pad_hour=True)
+
+def sql_short_label(col):
+    """SQL expression for '03/09 9:00 AM'"""
+    return f"substr({col}, 6, 2) || '/' || substr({col}, 9, 2) || ' ' || {_sql_clock(col)}"
+
+_PENDING_BOOKINGS_SQL = f"""
+    SELECT b.id, b.calendar_event_id, {sql_short_label("b.created_at")} AS created_label,
+           p.name, p.email,
+           {", ".join(f"b.preference{n}_start, b.preference{n}_end, "
+                      f"{sql_slot_start_label(f'b.preference{n}_start')}, {sql_slot_end_label(f'b.preference{n}_end')}"
+                      for n in (1, 2, 3))}
+    FROM bookings b
+    JOIN participants p ON b.participant_id = p.id
+    WHERE b.status = 'pending'
+    ORDER BY b.created_at ASC
+"""
 
 def get_pending_bookings():
+    """Return (row, preferences) pairs, where preferences lists (option_num, start, end, start_label, end_label)
+    for each filled option"""
     with db() as con:
-        return con.execute("""
-            SELECT b.*, p.name, p.email
-            FROM bookings b
-            JOIN participants p ON b.participant_id = p.id
-            WHERE b.status = 'pending'
-            ORDER BY b.created_at ASC
-        """).fetchall()
+        rows = con.execute(_PENDING_BOOKINGS_SQL).fetchall()
+
+    pending = []
+    for row in rows:
+        prefs = tuple(row)[5:]
+        preferences = [(i, *pref)
+                       for i, pref in enumerate(zip(prefs[0::4], prefs[1::4], prefs[2::4], prefs[3::4]), 1)
+                       if pref[0] and pref[1]]
+        pending.append((row, preferences))
+    return pending
+
+_background = ThreadPoolExecutor(max_workers=BACKGROUND_WORKERS, thread_name_prefix="background")
+# Batch invite emails share one long-lived pool, so each worker's SMTP session
+# (see smtp_send) carries over from one batch to the next
+_email_pool = ThreadPoolExecutor(max_workers=EMAIL_WORKERS, thread_name_prefix="email")
+_background_slots = threading.BoundedSemaphore(BACKGROUND_QUEUE_MAX)
+
+def run_in_background(fn, *args):
+    """Run fn(*args) on the background pool, or inline when the queue is already full"""
+    if not _background_slots.acquire(blocking=False):
+        print(f"[BACKGROUND] Queue full, running {fn.__name__} inline")
+        return fn(*args)
+
+    def task():
+        try:
+            result = fn(*args)
+            print(f"[BACKGROUND] {fn.__name__}: {result}")
+        except Exception as e:
+            print(f"[BACKGROUND] {fn.__name__} failed: {e}")
+        finally:
+            _background_slots.release()
+    return _background.submit(task)
+
+SMTP_IDLE_TIMEOUT = 60
+
+class SMTPSession:
+    """One logged-in SMTP connection, reused across sends until it drops or sits idle"""
+
+    def __init__(self):
+        self.server = None
+        self.last_used = 0.0
+
+    def _connect(self):
+        server = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=30)
+        try:
+            server.starttls()
+            if SMTP_USER and SMTP_PASS:
+                server.login(SMTP_USER, SMTP_PASS)
+        except Exception:
+            server.close()
+            raise
+        print(f"[SMTP] Connected to {SMTP_HOST}:{SMTP_PORT}")
+        self.server = server
+
+    def close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except smtplib.SMTPException:
+                self.server.close()
+            except OSError:
+                pass
+            self.server = None
+
+    def _alive(self):
+        try:
+            return self.server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def send(self, msg):
+        if self.server is not None and (time.monotonic() - self.last_used > SMTP_IDLE_TIMEOUT or not self._alive()):
+            self.close()
+        if self.server is None:
+            self._connect()
+        try:
+            self.server.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # Dropped between the health check and the send; retry once on a new connection
+            self.server = None
+            self._connect()
+            self.server.send_message(msg)
+        self.last_used = time.monotonic()
+
+_smtp_local = threading.local()
+
+def smtp_send(msg):
+    """Send msg over this thread's SMTP session (smtplib connections aren't thread-safe)"""
+    session = getattr(_smtp_local, "session", None)
+    if session is None:
+        session = _smtp_local.session = SMTPSession()
+    session.send(msg)
 
 def send_confirmation_email(to_email, to_name, start_time, end_time):
-    start_dt = datetime.fromisoformat(start_time)
-    end_dt = datetime.fromisoformat(end_time)
-    start_str = start_dt.strftime('%a %b %d, %I:%M %p').replace(' 0', ' ')
-    end_str = end_dt.strftime('%I:%M %p').replace(' 0', ' ')
+    start_str, end_str = slot_labels(start_time, end_time)
 
     body = f"""
 Hi {to_name},
@@ -222,7 +616,7 @@ User Study Booking System
     subject = "✅ User Study Booking CONFIRMED - Calendar Invite Coming Soon"
 
     # Try Gmail API first, fallback to SMTP
-    result = send_email_with_gmail_api(to_email, to_name, subject, body)
+    result = send_email_with_gmail_api(to_email, to_name, subject, body) if gmail_enabled() else "SKIPPED: Gmail not authorized"
 
     if result == "SUCCESS":
         return result
@@ -242,14 +636,8 @@ User Study Booking System
         msg["Subject"] = subject
         msg.set_content(body)
 
-        with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=30) as s:
-            print(f"[CONFIRMATION EMAIL] Connected to SMTP server")
-            s.starttls()
-            print(f"[CONFIRMATION EMAIL] STARTTLS enabled")
-            s.login(SMTP_USER, SMTP_PASS)
-            print(f"[CONFIRMATION EMAIL] Logged in successfully")
-            s.send_message(msg)
-            print(f"[CONFIRMATION EMAIL] Confirmation email sent successfully to {to_email}")
+        smtp_send(msg)
+        print(f"[CONFIRMATION EMAIL] Confirmation email sent successfully to {to_email}")
         return "SUCCESS"
     except smtplib.SMTPAuthenticationError as e:
         error_msg = f"SMTP Authentication failed: {str(e)}"
@@ -264,10 +652,66 @@ User Study Booking System
         print(f"[CONFIRMATION EMAIL ERROR] {error_msg}")
         return f"ERROR: {error_msg}"
 
+def send_cancellation_email(to_email, to_name, start_time, end_time):
+    start_str, end_str = slot_labels(start_time, end_time)
+
+    subject = "❌ User Study Booking CANCELLED - Important Update"
+
+    body = f"""Hi {to_name},
+
+We regret to inform you that your confirmed booking has been cancelled by our admin team.
+
+❌ CANCELLED APPOINTMENT:
+{start_str} – {end_str} (Toronto time)
+
+🗑️ WHAT'S BEEN DONE:
+• The calendar event has been removed from your calendar
+• Your booking slot is now available for other participants
+• You'll no longer receive reminders for this session
+
+📧 NEXT STEPS:
+If you have any questions or would like to reschedule, please reply to this email.
+
+Thank you for your understanding.
+
+Best regards,
+The Research Team
+
+---
+User Study Booking System"""
+
+    # Use the same email sending logic as confirmation emails
+    result = send_email_with_gmail_api(to_email, to_name, subject, body) if gmail_enabled() else "SKIPPED: Gmail not authorized"
+    if result == "SUCCESS":
+        print(f"[DEBUG] Cancellation email sent via Gmail API to {to_email}")
+        return result
+
+    # Fallback to SMTP if available
+    if not SMTP_HOST:
+        print(f"[DEBUG] DRY-RUN cancellation email for {to_email}")
+        return "DRY-RUN: No SMTP configured"
+
+    try:
+        msg = EmailMessage()
+        msg["From"] = SMTP_FROM
+        msg["To"] = f"{to_name} <{to_email}>"
+        msg["Subject"] = subject
+        msg.set_content(body)
+
+        smtp_send(msg)
+        print(f"[DEBUG] Cancellation email sent via SMTP to {to_email}")
+        return "SUCCESS"
+    except Exception as smtp_error:
+        print(f"[WARNING] SMTP cancellation email failed: {smtp_error}")
+        return f"ERROR: {smtp_error}"
+
 # Simple username/password authentication
 ADMIN_USERNAME = os.getenv("ADMIN_USERNAME", "admin")
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "password123")
 
+_RE_SMTP_USER = re.compile(r'^SMTP_USER=.*$', re.MULTILINE)
+_RE_SMTP_FROM = re.compile(r'^SMTP_FROM=.*$', re.MULTILINE)
+
 def update_env_with_user_email(user_email):
     """Update .env file with user's email for SMTP"""
     try:
@@ -277,9 +721,8 @@ def update_env_with_user_email(user_email):
                 content = f.read()
 
             # Update SMTP_USER and SMTP_FROM
-            import re
-            content = re.sub(r'SMTP_USER=.*', f'SMTP_USER={user_email}', content)
-            content = re.sub(r'SMTP_FROM=.*', f'SMTP_FROM=User Study <{user_email}>', content)
+            content = _RE_SMTP_USER.sub(lambda m: f'SMTP_USER={user_email}', content)
+            content = _RE_SMTP_FROM.sub(lambda m: f'SMTP_FROM=User Study <{user_email}>', content)
 
             with open(env_path, 'w') as f:
                 f.write(content)
@@ -302,15 +745,59 @@ def require_auth(f):
 def have_token():
     return os.path.exists(TOKEN_JSON)
 
+# (authed, gmail_ready) for the admin status cards, refreshed at most once a
+# minute and whenever reset_google_services() runs
+AUTH_STATE_TTL = 60
+_auth_state = {"value": None, "expires_at": 0.0}
+
+def google_auth_state():
+    now = time.monotonic()
+    if _auth_state["value"] is not None and now < _auth_state["expires_at"]:
+        return _auth_state["value"]
+    authed = have_token()
+    gmail_ready = False
+    if authed:
+        try:
+            creds = get_creds()
+            if creds and creds.valid and creds.scopes:
+                gmail_ready = GMAIL_SEND_SCOPE in creds.scopes
+        except Exception:
+            pass
+    _auth_state["value"] = (authed, gmail_ready)
+    _auth_state["expires_at"] = now + AUTH_STATE_TTL
+    return authed, gmail_ready
+
+# Parsed credentials are reused for up to 55 minutes (just under an access
+# token's lifetime); reset_google_services() drops them early
+CREDS_CACHE_TTL = 55 * 60
+_creds_cache = {"creds": None, "expires_at": 0.0, "gmail_enabled": None}
+
 def get_creds():
+    creds = _creds_cache["creds"]
+    if creds is not None and time.monotonic() < _creds_cache["expires_at"]:
+        return creds
+    creds = _load_creds()
+    if creds is not None:
+        _creds_cache["creds"] = creds
+        _creds_cache["expires_at"] = time.monotonic() + CREDS_CACHE_TTL
+    _creds_cache["gmail_enabled"] = bool(creds and creds.scopes and GMAIL_SEND_SCOPE in creds.scopes)
+    return creds
+
+def gmail_enabled():
+    """Whether the last loaded credentials can send through Gmail; emails go
+    straight to SMTP when they can't instead of reloading credentials each time"""
+    if _creds_cache["gmail_enabled"] is None:
+        get_creds()
+    return _creds_cache["gmail_enabled"]
+
+def _load_creds():
     print(f"[GET_CREDS] Checking for credentials...")
 
     # Try to get token from environment first
     token_data = os.getenv("GOOGLE_TOKEN_JSON", "")
     if token_data:
         try:
-            import json
-            token_info = json.loads(token_data)
+            token_info = json_loads(token_data)
             print(f"[GET_CREDS] Found environment token with scopes: {token_info.get('scopes', 'NONE')}")
             # Don't use SCOPES constant, use the scopes from the saved token
             creds = Credentials.from_authorized_user_info(token_info)
@@ -320,103 +807,314 @@ def get_creds():
             pass
 
     # Fallback to file
-    if os.path.exists(TOKEN_JSON):
-        print(f"[GET_CREDS] Found token file")
-        try:
-            creds = Credentials.from_authorized_user_file(TOKEN_JSON)
-            print(f"[GET_CREDS] File token scopes: {creds.scopes}")
-            return creds
-        except Exception as e:
-            print(f"[GET_CREDS] File token error: {e}")
+    try:
+        creds = Credentials.from_authorized_user_file(TOKEN_JSON)
+        print(f"[GET_CREDS] File token scopes: {creds.scopes}")
+        return creds
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"[GET_CREDS] File token error: {e}")
 
     print(f"[GET_CREDS] No valid credentials found")
     return None
 
+# OAuth client config, parsed once: GOOGLE_CLIENT_SECRETS_JSON when it holds
+# valid JSON, otherwise the client secrets file
+_oauth_client_config = {}
+
+def oauth_client_config():
+    config = _oauth_client_config.get("config")
+    if config is not None:
+        return config
+    if GOOGLE_CREDENTIALS_JSON:
+        try:
+            config = json_loads(GOOGLE_CREDENTIALS_JSON)
+        except ValueError as json_err:
+            print(f"[OAUTH WARNING] Invalid JSON in GOOGLE_CLIENT_SECRETS_JSON: {json_err}")
+            print(f"[OAUTH INFO] Falling back to credentials file: {OAUTH_CLIENT_JSON}")
+    if config is None:
+        with open(OAUTH_CLIENT_JSON, "rb") as f:
+            config = json_loads(f.read())
+    _oauth_client_config["config"] = config
+    return config
+
+def oauth_flow(scopes):
+    return Flow.from_client_config(oauth_client_config(), scopes=scopes,
+                                   redirect_uri=f"{HOST_BASE}/oauth2callback")
+
+# Flows that only build authorization URLs are reused per thread (an OAuth2Session
+# isn't thread-safe). The callback keeps a fresh Flow, since fetch_token() stores
+# the exchanged token on it.
+_auth_flow_local = threading.local()
+
+def auth_url_flow(scopes):
+    flows = getattr(_auth_flow_local, "flows", None)
+    if flows is None:
+        flows = _auth_flow_local.flows = {}
+    key = tuple(scopes)
+    flow = flows.get(key)
+    if flow is None:
+        flow = flows[key] = oauth_flow(scopes)
+    return flow
+
 def save_creds(creds: Credentials):
     with open(TOKEN_JSON, "w") as f:
         f.write(creds.to_json())
+    reset_google_services()
+
+class OrjsonModel(JsonModel):
+    """JsonModel that parses API response bodies with orjson"""
+    def deserialize(self, content):
+        try:
+            body = orjson.loads(content)
+        except orjson.JSONDecodeError:
+            return super().deserialize(content)
+        if self._data_wrapper and "data" in body:
+            body = body["data"]
+        return body
+
+# Response model for the API clients below; None keeps googleapiclient's default
+API_MODEL = OrjsonModel() if orjson else None
+
+@lru_cache(maxsize=None)
+def _discovery_doc(api, version):
+    # Discovery documents bundled with googleapiclient; None if this one isn't
+    return get_static_doc(api, version)
+
+def build_google_service(api, version, creds):
+    """Build an API client from the bundled discovery document, read from disk once.
+    The document is parsed for each build because building modifies it."""
+    doc = _discovery_doc(api, version)
+    if doc is None:
+        return build(api, version, credentials=creds, cache_discovery=False, model=API_MODEL)
+    return build_from_document(json_loads(doc), credentials=creds, model=API_MODEL)
+
+# Built Google API clients, reused across requests while their credentials stay
+# valid. httplib2 transports aren't thread-safe, so each thread keeps its own;
+# bumping the generation invalidates every thread's clients.
+GMAIL_SEND_SCOPE = "https://www.googleapis.com/auth/gmail.send"
+_svc_local = threading.local()
+_svc_generation = 0
+
+def reset_google_services():
+    global _svc_generation
+    _svc_generation += 1
+    _creds_cache["creds"] = None
+    _creds_cache["gmail_enabled"] = None
+    _auth_state["value"] = None
+
+def _cached_service(api):
+    entry = getattr(_svc_local, api, None)
+    if entry and entry[2] == _svc_generation and entry[1].valid:
+        return entry[0]
+    return None
+
+def _cache_service(api, svc, creds):
+    setattr(_svc_local, api, (svc, creds, _svc_generation))
 
 def calendar_service():
+    svc = _cached_service("calendar")
+    if svc is not None:
+        return svc
+
     creds = get_creds()
     if not creds or not creds.valid:
         if creds and creds.expired and creds.refresh_token:
-            creds.refresh()  # google-auth handles via Request auto; not needed with discovery v2
+            try:
+                creds.refresh(Request())
+            except RefreshError as e:
+                reset_google_services()
+                raise RuntimeError(f"Google token refresh failed ({e}). Visit /google-auth to reconnect.")
         else:
             raise RuntimeError("Google token missing. Visit /google-auth to connect.")
-    return build("calendar", "v3", credentials=creds, cache_discovery=False)
+    svc = build_google_service("calendar", "v3", creds)
+    _cache_service("calendar", svc, creds)
+    return svc
+
+def gmail_service():
+    """Return (service, error) where error is the ERROR string to report when Gmail can't be used"""
+    svc = _cached_service("gmail")
+    if svc is not None:
+        return svc, ""
+
+    creds = get_creds()
+    if not creds or not creds.valid:
+        print("[GMAIL API] No valid credentials available")
+        return None, "ERROR: Gmail API credentials not available - please sign in with Google"
+
+    if not creds.scopes or GMAIL_SEND_SCOPE not in creds.scopes:
+        print(f"[GMAIL API] Missing Gmail send scope. Current scopes: {creds.scopes}")
+        return None, "ERROR: Gmail send permission not granted - please re-authenticate with Google"
+
+    svc = build_google_service("gmail", "v1", creds)
+    _cache_service("gmail", svc, creds)
+    return svc, ""
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Helpers
 # ──────────────────────────────────────────────────────────────────────────────
+_UTC = timezone.utc
+
 def to_iso_utc(dt_local: datetime):
     if dt_local.tzinfo is None:
         dt_local = dt_local.replace(tzinfo=TZ)
-    return dt_local.astimezone(timezone.utc).replace(microsecond=0).isoformat()
+    return dt_local.astimezone(_UTC).replace(microsecond=0).isoformat()
+
+try:
+    from ciso8601 import parse_datetime as parse_slot_iso  # optional C parser
+except ImportError:
+    parse_slot_iso = datetime.fromisoformat
 
 def parse_iso(s):  # RFC3339 -> aware datetime
-    return datetime.fromisoformat(s.replace("Z", "+00:00"))
+    if s[-1] == "Z":
+        s = s[:-1] + "+00:00"
+    return parse_slot_iso(s)
+
+# strftime flag for an unpadded field ("%-d" on glibc/macOS, "%#d" on Windows)
+_NOPAD = "#" if os.name == "nt" else "-"
+DAY_HEADER_FMT = f"%a %{_NOPAD}m/%d"          # Mon 3/09
+WEEK_LABEL_FMT = f"%b %{_NOPAD}d"             # Mar 9
+SLOT_START_FMT = f"%a %b %{_NOPAD}d, %{_NOPAD}I:%M %p"  # Mon Mar 9, 9:00 AM
+SLOT_END_FMT = "%I:%M %p"                     # 10:00 AM
+STAMP_FMT = f"%m/%d %{_NOPAD}I:%M %p"         # 03/09 9:00 AM
+CALENDAR_SLOT_FMT = f"{DAY_HEADER_FMT} %{_NOPAD}I:%M %p"  # Mon 3/09 9:00 AM
+
+@lru_cache(maxsize=512)
+def day_header(day):
+    """Calendar column header for a date, e.g. Mon 3/09"""
+    return day.strftime(DAY_HEADER_FMT)
+
+@lru_cache(maxsize=128)
+def week_label(monday):
+    """Week range label for the week starting at monday, e.g. Mar 9 - Mar 15"""
+    return f"{monday.strftime(WEEK_LABEL_FMT)} - {(monday + timedelta(days=6)).strftime(WEEK_LABEL_FMT)}"
+
+@lru_cache(maxsize=512)
+def slot_labels(start_iso, end_iso):
+    """(start, end) display strings for a slot given as ISO times, e.g. ("Mon Mar 9, 9:00 AM", "10:00 AM")"""
+    return (datetime.fromisoformat(start_iso).strftime(SLOT_START_FMT),
+            datetime.fromisoformat(end_iso).strftime(SLOT_END_FMT))
+
+_ASSET_VERSIONS = {}
+
+@app.template_global()
+def asset_url(filename):
+    """URL for a file in static/, tagged with its content hash so browsers can cache it long-term"""
+    version = _ASSET_VERSIONS.get(filename)
+    if version is None:
+        with open(os.path.join(app.static_folder, filename), "rb") as f:
+            version = hashlib.blake2b(f.read(), digest_size=8).hexdigest()
+        _ASSET_VERSIONS[filename] = version
+    return url_for('static', filename=filename, v=version)
+
+# Slot boundaries as offsets from local midnight: 09:00 through 01:00 the next day
+_SLOT_BOUNDARIES = tuple(timedelta(hours=h) for h in range(9, 26))
 
 def slot_range_for_day(day_local: datetime):
-    """Yield (start_local, end_local) 1-hour slots 09:00..01:00 (last start 24:00)."""
-    base = day_local.replace(hour=9, minute=0, second=0, microsecond=0, tzinfo=TZ)
-    for h in range(0, 16):  # 9..24 inclusive
-        start = base + timedelta(hours=h)
-        end = start + timedelta(hours=1)
-        yield start, end
+    """(start_local, end_local) 1-hour slots 09:00..01:00 (last start 24:00)."""
+    # Aware datetime + timedelta is wall-clock arithmetic, so each boundary lands on
+    # its hour even across DST changes; each slot's end is the next slot's start
+    midnight = day_local.replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=TZ)
+    bounds = [midnight + offset for offset in _SLOT_BOUNDARIES]
+    return zip(bounds, bounds[1:])
 
 def freebusy_blocks(service, start_utc_iso, end_utc_iso):
+    body = {
+        "timeMin": start_utc_iso,
+        "timeMax": end_utc_iso,
+        "timeZone": "UTC",
+        "items": [{"id": CALENDAR_ID}],
+    }
     try:
-        body = {
-            "timeMin": start_utc_iso,
-            "timeMax": end_utc_iso,
-            "timeZone": "UTC",
-            "items": [{"id": CALENDAR_ID}],
-        }
-        fb = service.freebusy().query(body=body).execute()
+        try:
+            fb = service.freebusy().query(body=body).execute()
+        except HttpError as e:
+            if e.resp.status != 401:
+                raise
+            # The cached client's token was rejected: rebuild it from fresh credentials once
+            print("[CALENDAR API] 401 from FreeBusy, rebuilding the calendar client")
+            reset_google_services()
+            fb = calendar_service().freebusy().query(body=body).execute()
         return fb["calendars"][CALENDAR_ID]["busy"]  # list of {start,end}
     except Exception as e:
         # Handle rate limit errors gracefully
         if "rateLimitExceeded" in str(e) or "Quota exceeded" in str(e):
-            print(f"[CALENDAR API] Rate limit exceeded, returning empty busy blocks")
-            return []
+            print("[CALENDAR API] Rate limit exceeded, no busy blocks returned")
+            return None
         raise
 
-def is_free(service, start_local: datetime, end_local: datetime):
-    # Check if slot is blocked by admin
+def get_blocked_slot_keys(start_local: datetime, end_local: datetime):
+    """Return the (start_time, end_time) ISO pairs of blocked slots starting in [start_local, end_local)"""
     with db() as con:
-        blocked = con.execute(
-            "SELECT 1 FROM blocked_slots WHERE start_time = ? AND end_time = ?",
+        rows = con.execute(
+            "SELECT start_time, end_time FROM blocked_slots WHERE start_time >= ? AND start_time < ?",
             (start_local.isoformat(), end_local.isoformat())
-        ).fetchone()
-        if blocked:
-            return False
-
-    # Query only the 2h window around it for speed
-    min_iso = to_iso_utc(start_local - timedelta(minutes=1))
-    max_iso = to_iso_utc(end_local + timedelta(minutes=1))
-    for b in freebusy_blocks(service, min_iso, max_iso):
-        bstart = parse_iso(b["start"])
-        bend = parse_iso(b["end"])
-        if not (end_local <= bstart.astimezone(TZ) or start_local >= bend.astimezone(TZ)):
-            return False
-    return True
+        ).fetchall()
+    return frozenset((r["start_time"], r["end_time"]) for r in rows)
+
+# FreeBusy answers are shared across requests for a short time; stored as
+# parallel arrays of merged, sorted start/end epochs
+BUSY_CACHE_TTL = 45
+BUSY_CACHE_MAX = 64
+BusyIntervals = namedtuple("BusyIntervals", "starts ends")
+_busy_cache = {}
+_busy_cache_lock = threading.Lock()
+
+def invalidate_busy_cache():
+    """Drop cached FreeBusy results; call after anything that changes the calendar"""
+    with _busy_cache_lock:
+        _busy_cache.clear()
+    invalidate_invite_grids()
+
+def get_busy_intervals(service, start_local: datetime, end_local: datetime, refresh=False):
+    """Busy intervals between start_local and end_local as BusyIntervals(starts, ends) epoch arrays"""
+    key = (CALENDAR_ID, start_local.isoformat(), end_local.isoformat())
+    now = time.monotonic()
+    with _busy_cache_lock:
+        hit = _busy_cache.get(key)
+    if hit and hit[0] > now and not refresh:
+        return hit[1]
+
+    blocks = freebusy_blocks(service, to_iso_utc(start_local), to_iso_utc(end_local))
+    if blocks is None:
+        # Rate limited: fall back to the last answer for this range (even if
+        # expired) and don't cache an empty, all-free one in its place
+        return hit[1] if hit else BusyIntervals(array('q'), array('q'))
+    intervals = BusyIntervals(array('q'), array('q'))
+    for busy_start, busy_end in sorted(
+            (int(parse_iso(b["start"]).timestamp()), int(parse_iso(b["end"]).timestamp())) for b in blocks):
+        # Merge overlaps so ends stay sorted too
+        if intervals.ends and busy_start <= intervals.ends[-1]:
+            intervals.ends[-1] = max(intervals.ends[-1], busy_end)
+        else:
+            intervals.starts.append(busy_start)
+            intervals.ends.append(busy_end)
+    with _busy_cache_lock:
+        if len(_busy_cache) >= BUSY_CACHE_MAX:
+            for k in [k for k, (expires, _) in _busy_cache.items() if expires <= now]:
+                del _busy_cache[k]
+            if len(_busy_cache) >= BUSY_CACHE_MAX:
+                del _busy_cache[next(iter(_busy_cache))]  # oldest entry
+        _busy_cache[key] = (now + BUSY_CACHE_TTL, intervals)
+    return intervals
+
+def availability_version(busy_intervals):
+    """Short tag identifying a set of busy intervals, echoed back by the invite page on submit"""
+    return hashlib.blake2b(bytes(busy_intervals.starts) + bytes(busy_intervals.ends), digest_size=8).hexdigest()
+
+def overlaps_busy(busy_intervals, start_ts, end_ts):
+    # Last interval starting before the slot ends is the only one that can overlap it
+    i = bisect_left(busy_intervals.starts, end_ts) - 1
+    return i >= 0 and busy_intervals.ends[i] > start_ts
 
 def send_email_with_gmail_api(to_email, to_name, subject, body):
     """Send email using Gmail API instead of SMTP"""
     try:
-        # Get credentials for Gmail API
-        creds = get_creds()
-        if not creds or not creds.valid:
-            print("[GMAIL API] No valid credentials available")
-            return "ERROR: Gmail API credentials not available - please sign in with Google"
-
-        # Check if we have Gmail scope
-        if not creds.scopes or 'https://www.googleapis.com/auth/gmail.send' not in creds.scopes:
-            print(f"[GMAIL API] Missing Gmail send scope. Current scopes: {creds.scopes}")
-            return "ERROR: Gmail send permission not granted - please re-authenticate with Google"
-
-        # Build Gmail service
-        service = build("gmail", "v1", credentials=creds, cache_discovery=False)
+        # Reuse this thread's Gmail client when the credentials haven't changed
+        service, error = gmail_service()
+        if error:
+            return error
 
         # Create message
         message = MIMEText(body)
@@ -454,9 +1152,6 @@ def send_email_with_gmail_api(to_email, to_name, subject, body):
 
 def send_initial_email(to_email, to_name, link):
     """Send email using simple method that works"""
-    body_tpl = get_setting("email_body")
-    body = body_tpl.replace("{{name}}", to_name).replace("{{link}}", link)
-
     # Enhanced email body with calendar selection info
     enhanced_body = f"""
 Hi {to_name},
@@ -500,9 +1195,6 @@ Professor Ali Mazalek
         print(f"[EMAIL FALLBACK] No SMTP configured, logging email for manual sending")
     else:
         try:
-            import smtplib
-            from email.mime.text import MIMEText
-            from email.mime.multipart import MIMEMultipart
 
             # Create email
             msg = MIMEMultipart('alternative')
@@ -521,10 +1213,7 @@ Professor Ali Mazalek
             msg.attach(html_part)
 
             # Send email
-            with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-                server.starttls()
-                server.login(SMTP_USER, SMTP_PASS)
-                server.send_message(msg)
+            smtp_send(msg)
 
             print(f"[INITIAL EMAIL] Email sent successfully via SMTP to {to_email}")
             return "SUCCESS"
@@ -553,95 +1242,6 @@ Booking Link: {link}
 # ──────────────────────────────────────────────────────────────────────────────
 # Authentication Routes
 # ──────────────────────────────────────────────────────────────────────────────
-LOGIN_HTML = """
-<!doctype html><meta charset="utf-8">
-<title>Login - {{title}}</title>
-<style>
- * { box-sizing: border-box; }
- body {
-   font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, system-ui, sans-serif;
-   background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-   min-height: 100vh; display: flex; align-items: center; justify-content: center;
-   margin: 0; padding: 20px;
- }
- .login-card {
-   background: white; border-radius: 16px; padding: 40px; width: 100%; max-width: 400px;
-   box-shadow: 0 20px 40px rgba(0,0,0,0.1); text-align: center;
- }
- h1 { margin: 0 0 30px; color: #2d3748; }
- .form-group { margin: 20px 0; text-align: left; }
- label { display: block; margin-bottom: 8px; color: #4a5568; font-weight: 600; }
- input[type="text"], input[type="password"] {
-   width: 100%; padding: 12px 16px; border: 2px solid #e2e8f0; border-radius: 10px;
-   font-size: 16px; transition: all 0.2s; font-family: inherit;
- }
- input[type="text"]:focus, input[type="password"]:focus {
-   outline: none; border-color: #667eea; box-shadow: 0 0 0 3px rgba(102, 126, 234, 0.1);
- }
- .login-btn {
-   width: 100%; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-   color: white; border: none; padding: 12px 24px; border-radius: 10px;
-   cursor: pointer; font-weight: 600; font-size: 16px; transition: all 0.2s;
-   font-family: inherit; margin: 20px 0;
- }
- .login-btn:hover {
-   transform: translateY(-2px); box-shadow: 0 10px 20px rgba(102, 126, 234, 0.3);
- }
- .google-btn {
-   display: flex; align-items: center; justify-content: center; gap: 12px;
-   width: 100%; background: white; border: 2px solid #e2e8f0; border-radius: 10px;
-   padding: 12px 24px; font-size: 16px; font-weight: 600; color: #2d3748;
-   text-decoration: none; transition: all 0.2s; margin: 10px 0;
- }
- .google-btn:hover {
-   border-color: #4285f4; box-shadow: 0 4px 12px rgba(66, 133, 244, 0.2);
-   transform: translateY(-2px);
- }
- .google-icon {
-   width: 20px; height: 20px;
-   background: url('data:image/svg+xml,<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24"><path fill="%234285f4" d="M22.56 12.25c0-.78-.07-1.53-.2-2.25H12v4.26h5.92c-.26 1.37-1.04 2.53-2.21 3.31v2.77h3.57c2.08-1.92 3.28-4.74 3.28-8.09z"/><path fill="%2334a853" d="M12 23c2.97 0 5.46-.98 7.28-2.66l-3.57-2.77c-.98.66-2.23 1.06-3.71 1.06-2.86 0-5.29-1.93-6.16-4.53H2.18v2.84C3.99 20.53 7.7 23 12 23z"/><path fill="%23fbbc05" d="M5.84 14.09c-.22-.66-.35-1.36-.35-2.09s.13-1.43.35-2.09V7.07H2.18C1.43 8.55 1 10.22 1 12s.43 3.45 1.18 4.93l2.85-2.22.81-.62z"/><path fill="%23ea4335" d="M12 5.38c1.62 0 3.06.56 4.21 1.64l3.15-3.15C17.45 2.09 14.97 1 12 1 7.7 1 3.99 3.47 2.18 7.07l3.66 2.84c.87-2.6 3.3-4.53 6.16-4.53z"/></svg>') center/contain no-repeat;
- }
- .error { background: #fed7d7; color: #9b2c2c; padding: 15px; border-radius: 10px; margin: 15px 0; }
- .note { color: #718096; font-size: 14px; margin-top: 20px; line-height: 1.4; }
- .divider { margin: 30px 0; text-align: center; color: #718096; position: relative; }
- .divider:before { content: ''; position: absolute; top: 50%; left: 0; right: 0; height: 1px; background: #e2e8f0; }
- .divider span { background: white; padding: 0 20px; }
-</style>
-<div class="login-card">
-  <h1>🔐 Admin Login</h1>
-
-  {% if error %}
-  <div class="error">❌ {{error}}</div>
-  {% endif %}
-
-  <a href="/google-login" class="google-btn">
-    <div class="google-icon"></div>
-    Sign in with Google (Recommended)
-  </a>
-
-  <div class="divider"><span>OR</span></div>
-
-  <form method="post" action="/login">
-    <div class="form-group">
-      <label for="username">Username</label>
-      <input type="text" id="username" name="username" required>
-    </div>
-
-    <div class="form-group">
-      <label for="password">Password</label>
-      <input type="password" id="password" name="password" required>
-    </div>
-
-    <button type="submit" class="login-btn">Sign In with Password</button>
-  </form>
-
-  <div class="note">
-    <strong>Email Setup Required</strong><br>
-    Google sign-in is required for email functionality. Username/password login requires manual email sending.
-  </div>
-</div>
-"""
-
 @app.route("/login", methods=["GET", "POST"])
 def login():
     error = ""
@@ -649,7 +1249,10 @@ def login():
         username = request.form.get("username", "").strip()
         password = request.form.get("password", "").strip()
 
-        if username == ADMIN_USERNAME and password == ADMIN_PASSWORD:
+        # Constant-time compare of both fields, so timing reveals neither
+        user_ok = hmac.compare_digest(username.encode(), ADMIN_USERNAME.encode())
+        password_ok = hmac.compare_digest(password.encode(), ADMIN_PASSWORD.encode())
+        if user_ok & password_ok:
             session['authenticated'] = True
             session['user_email'] = SMTP_USER  # Use the configured email
             session['user_name'] = "Admin"
@@ -660,45 +1263,17 @@ def login():
 
     if request.args.get('error') == 'auth_failed':
         error = "Authentication failed. Please try again."
-    return render_template_string(LOGIN_HTML, title=APP_TITLE, error=error)
+    return render_template("login.html", title=APP_TITLE, error=error)
 
 @app.get("/google-login")
 def google_login():
     # Use the exact scopes that Google returns
-    admin_scopes = [
-        "https://www.googleapis.com/auth/calendar",
-        "https://www.googleapis.com/auth/gmail.send",
-        "https://www.googleapis.com/auth/userinfo.email",
-        "https://www.googleapis.com/auth/userinfo.profile",
-        "openid"
-    ]
+    admin_scopes = ADMIN_SCOPES
 
     # Create Google OAuth flow
     print(f"[OAUTH] Requesting scopes: {admin_scopes}")
     try:
-        if GOOGLE_CREDENTIALS_JSON:
-            try:
-                import json
-                client_config = json.loads(GOOGLE_CREDENTIALS_JSON)
-                flow = Flow.from_client_config(
-                    client_config,
-                    scopes=admin_scopes,
-                    redirect_uri=f"{HOST_BASE}/oauth2callback",
-                )
-            except json.JSONDecodeError as json_err:
-                print(f"[OAUTH WARNING] Invalid JSON in GOOGLE_CLIENT_SECRETS_JSON: {json_err}")
-                print(f"[OAUTH INFO] Falling back to credentials file: {OAUTH_CLIENT_JSON}")
-                flow = Flow.from_client_secrets_file(
-                    OAUTH_CLIENT_JSON,
-                    scopes=admin_scopes,
-                    redirect_uri=f"{HOST_BASE}/oauth2callback",
-                )
-        else:
-            flow = Flow.from_client_secrets_file(
-                OAUTH_CLIENT_JSON,
-                scopes=admin_scopes,
-                redirect_uri=f"{HOST_BASE}/oauth2callback",
-            )
+        flow = auth_url_flow(admin_scopes)
     except Exception as e:
         print(f"[OAUTH ERROR] Failed to create OAuth flow: {e}")
         return f"OAuth configuration error: {str(e)}", 500
@@ -723,9 +1298,11 @@ def logout():
 def reset_auth():
     """Reset Google authentication to force re-authentication with all scopes"""
     # Delete token file to force re-authentication
-    if os.path.exists(TOKEN_JSON):
+    try:
         os.remove(TOKEN_JSON)
         print("[RESET AUTH] Deleted token file")
+    except FileNotFoundError:
+        pass
 
     # Clear any environment token data
     if "GOOGLE_TOKEN_JSON" in os.environ:
@@ -733,6 +1310,7 @@ def reset_auth():
         print("[RESET AUTH] Cleared environment token")
 
     # Clear any cached credentials and session data
+    reset_google_services()
     session.clear()
     print("[RESET AUTH] Cleared all session data")
 
@@ -745,6 +1323,7 @@ def clear_env_token():
     if "GOOGLE_TOKEN_JSON" in os.environ:
         del os.environ["GOOGLE_TOKEN_JSON"]
         print("[CLEAR ENV] Removed GOOGLE_TOKEN_JSON from environment")
+        reset_google_services()
         return "Environment token cleared. <a href='/debug'>Check debug</a> | <a href='/admin'>Go to admin</a>"
     else:
         return "No environment token found. <a href='/debug'>Check debug</a> | <a href='/admin'>Go to admin</a>"
@@ -753,50 +1332,27 @@ def clear_env_token():
 def force_gmail_auth():
     """Force Gmail authentication with explicit scope"""
     # Clear everything first - file, environment, and session
-    if os.path.exists(TOKEN_JSON):
+    try:
         os.remove(TOKEN_JSON)
         print("[FORCE GMAIL AUTH] Deleted token file")
+    except FileNotFoundError:
+        pass
 
     if "GOOGLE_TOKEN_JSON" in os.environ:
         del os.environ["GOOGLE_TOKEN_JSON"]
         print("[FORCE GMAIL AUTH] Cleared environment token")
 
+    reset_google_services()
     session.clear()
     print("[FORCE GMAIL AUTH] Cleared session")
 
     # Explicit Gmail + Calendar scopes
-    gmail_scopes = [
-        "https://www.googleapis.com/auth/calendar",
-        "https://www.googleapis.com/auth/gmail.send",
-        "https://www.googleapis.com/auth/userinfo.email",
-        "https://www.googleapis.com/auth/userinfo.profile",
-        "openid"
-    ]
+    gmail_scopes = ADMIN_SCOPES
 
     print(f"[FORCE GMAIL AUTH] Requesting scopes: {gmail_scopes}")
 
     try:
-        if GOOGLE_CREDENTIALS_JSON:
-            try:
-                import json
-                client_config = json.loads(GOOGLE_CREDENTIALS_JSON)
-                flow = Flow.from_client_config(
-                    client_config,
-                    scopes=gmail_scopes,
-                    redirect_uri=f"{HOST_BASE}/oauth2callback",
-                )
-            except json.JSONDecodeError:
-                flow = Flow.from_client_secrets_file(
-                    OAUTH_CLIENT_JSON,
-                    scopes=gmail_scopes,
-                    redirect_uri=f"{HOST_BASE}/oauth2callback",
-                )
-        else:
-            flow = Flow.from_client_secrets_file(
-                OAUTH_CLIENT_JSON,
-                scopes=gmail_scopes,
-                redirect_uri=f"{HOST_BASE}/oauth2callback",
-            )
+        flow = auth_url_flow(gmail_scopes)
 
         auth_url, state = flow.authorization_url(
             access_type="offline",
@@ -835,7 +1391,7 @@ def debug():
         if creds:
             debug_info["CREDENTIALS_VALID"] = "YES" if creds.valid else "NO (expired)"
             debug_info["CREDENTIALS_SCOPES"] = ", ".join(creds.scopes) if creds.scopes else "NONE"
-            debug_info["HAS_GMAIL_SCOPE"] = "YES" if creds.scopes and 'https://www.googleapis.com/auth/gmail.send' in creds.scopes else "NO"
+            debug_info["HAS_GMAIL_SCOPE"] = "YES" if creds.scopes and GMAIL_SEND_SCOPE in creds.scopes else "NO"
         else:
             debug_info["CREDENTIALS_VALID"] = "NO CREDENTIALS"
     except Exception as e:
@@ -848,8 +1404,9 @@ def debug():
 
         # Test Gmail service creation first
         try:
-            creds = get_creds()
-            service = build("gmail", "v1", credentials=creds, cache_discovery=False)
+            service, service_error = gmail_service()
+            if service is None:
+                raise RuntimeError(service_error)
             debug_info["GMAIL_SERVICE"] = "OK"
 
             # Test simple API call
@@ -885,29 +1442,7 @@ def google_auth():
     user_domain = user_email.split('@')[-1] if '@' in user_email else 'torontomu.ca'
 
     try:
-        if GOOGLE_CREDENTIALS_JSON:
-            try:
-                import json
-                client_config = json.loads(GOOGLE_CREDENTIALS_JSON)
-                flow = Flow.from_client_config(
-                    client_config,
-                    scopes=SCOPES,
-                    redirect_uri=f"{HOST_BASE}/oauth2callback",
-                )
-            except json.JSONDecodeError as json_err:
-                print(f"[OAUTH WARNING] Invalid JSON in GOOGLE_CLIENT_SECRETS_JSON: {json_err}")
-                print(f"[OAUTH INFO] Falling back to credentials file: {OAUTH_CLIENT_JSON}")
-                flow = Flow.from_client_secrets_file(
-                    OAUTH_CLIENT_JSON,
-                    scopes=SCOPES,
-                    redirect_uri=f"{HOST_BASE}/oauth2callback",
-                )
-        else:
-            flow = Flow.from_client_secrets_file(
-                OAUTH_CLIENT_JSON,
-                scopes=SCOPES,
-                redirect_uri=f"{HOST_BASE}/oauth2callback",
-            )
+        flow = auth_url_flow(SCOPES)
     except Exception as e:
         print(f"[OAUTH ERROR] Failed to create OAuth flow: {e}")
         return f"OAuth configuration error: {str(e)}", 500
@@ -921,6 +1456,14 @@ def google_auth():
     session['auth_type'] = 'calendar'
     return redirect(auth_url)
 
+@lru_cache(maxsize=64)
+def id_token_identity(id_token):
+    """(email, name) from an ID token's claims; a retried login hands back the same token"""
+    import jwt
+    claims = jwt.decode(id_token, options={"verify_signature": False})
+    email = claims.get('email', '').lower()
+    return email, claims.get('name', email.split('@')[0])
+
 @app.get("/oauth2callback")
 def oauth2callback():
     stored_state = session.get('oauth_state')
@@ -932,40 +1475,12 @@ def oauth2callback():
     try:
         # Determine scopes based on auth type
         if auth_type == 'admin':
-            scopes = [
-                "https://www.googleapis.com/auth/calendar",
-                "https://www.googleapis.com/auth/gmail.send",
-                "https://www.googleapis.com/auth/userinfo.email",
-                "https://www.googleapis.com/auth/userinfo.profile",
-                "openid"
-            ]
+            scopes = ADMIN_SCOPES
         else:
             scopes = SCOPES
 
         try:
-            if GOOGLE_CREDENTIALS_JSON:
-                try:
-                    import json
-                    client_config = json.loads(GOOGLE_CREDENTIALS_JSON)
-                    flow = Flow.from_client_config(
-                        client_config,
-                        scopes=scopes,
-                        redirect_uri=f"{HOST_BASE}/oauth2callback",
-                    )
-                except json.JSONDecodeError as json_err:
-                    print(f"[OAUTH WARNING] Invalid JSON in GOOGLE_CLIENT_SECRETS_JSON: {json_err}")
-                    print(f"[OAUTH INFO] Falling back to credentials file: {OAUTH_CLIENT_JSON}")
-                    flow = Flow.from_client_secrets_file(
-                        OAUTH_CLIENT_JSON,
-                        scopes=scopes,
-                        redirect_uri=f"{HOST_BASE}/oauth2callback",
-                    )
-            else:
-                flow = Flow.from_client_secrets_file(
-                    OAUTH_CLIENT_JSON,
-                    scopes=scopes,
-                    redirect_uri=f"{HOST_BASE}/oauth2callback",
-                )
+            flow = oauth_flow(scopes)
         except Exception as e:
             print(f"[OAUTH ERROR] Failed to create OAuth flow: {e}")
             return redirect(url_for("login") + "?error=oauth_config_failed")
@@ -975,8 +1490,7 @@ def oauth2callback():
         if auth_type == 'admin':
             try:
                 # Try OAuth2 API first (more reliable)
-                from googleapiclient.discovery import build
-                oauth_service = build('oauth2', 'v2', credentials=creds)  # Use v2 instead of v1
+                oauth_service = build_google_service('oauth2', 'v2', creds)  # Use v2 instead of v1
                 user_info = oauth_service.userinfo().get().execute()
                 user_email = user_info.get('email', '').lower()
                 user_name = user_info.get('name', user_email.split('@')[0])
@@ -985,12 +1499,9 @@ def oauth2callback():
                 print(f"[INFO] OAuth API failed: {api_error}")
                 try:
                     # Fallback: try to decode ID token
-                    import jwt
                     id_token = creds.id_token
                     if id_token:
-                        user_info = jwt.decode(id_token, options={"verify_signature": False})
-                        user_email = user_info.get('email', '').lower()
-                        user_name = user_info.get('name', user_email.split('@')[0])
+                        user_email, user_name = id_token_identity(id_token)
                         print(f"[INFO] Got user info from ID token: {user_email}")
                     else:
                         raise Exception("No ID token")
@@ -1016,614 +1527,53 @@ def oauth2callback():
         print(f"[OAUTH SUCCESS] Saved credentials with scopes: {creds.scopes}")
 
         # Clean up OAuth session data
-        session.pop('oauth_state', None)
-        session.pop('auth_type', None)
+        for key in ('oauth_state', 'auth_type'):
+            session.pop(key, None)
 
         return redirect(url_for("admin"))
 
-    except Exception as e:
-        import traceback
-        print(f"[AUTH ERROR] {e}")
-        print(f"[AUTH ERROR TRACEBACK] {traceback.format_exc()}")
+    except Exception:
+        # The traceback is only formatted if a handler actually emits it
+        _log.exception("[AUTH ERROR] oauth2callback failed")
         return redirect(url_for("login") + "?error=auth_failed")
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Admin UI
 # ──────────────────────────────────────────────────────────────────────────────
-ADMIN_HTML = """
-<!doctype html><meta charset="utf-8">
-<title>Admin · {{title}}</title>
-<meta name="viewport" content="width=device-width, initial-scale=1">
-<style>
- * { box-sizing: border-box; }
- body {
-   font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, system-ui, sans-serif;
-   margin: 0; padding: 0; min-height: 100vh;
-   background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
- }
- .container {
-   max-width: 1400px; margin: 0 auto; padding: 20px;
- }
- .header {
-   background: rgba(255,255,255,0.1); backdrop-filter: blur(20px);
-   border-radius: 20px; padding: 30px; margin-bottom: 30px;
-   color: white; display: flex; justify-content: space-between; align-items: center;
-   box-shadow: 0 8px 32px rgba(0,0,0,0.1);
- }
- .header h1 {
-   margin: 0; font-size: 3em; font-weight: 700;
-   text-shadow: 0 2px 10px rgba(0,0,0,0.1);
- }
- .user-info {
-   text-align: right; font-size: 0.95em;
-   background: rgba(255,255,255,0.2); padding: 15px; border-radius: 12px;
- }
- .user-info a {
-   color: #fed7d7; text-decoration: none; font-weight: 600;
-   transition: color 0.2s;
- }
- .user-info a:hover { color: white; }
- .dashboard-grid {
-   display: grid; grid-template-columns: 2fr 1fr; gap: 30px; margin-bottom: 30px;
- }
- .status-overview {
-   background: white; border-radius: 20px; padding: 30px;
-   box-shadow: 0 10px 40px rgba(0,0,0,0.1);
- }
- .status-cards {
-   display: grid; grid-template-columns: repeat(3, 1fr); gap: 20px; margin-bottom: 30px;
- }
- .status-card {
-   background: linear-gradient(135deg, #f8fafc 0%, #e2e8f0 100%);
-   border-radius: 16px; padding: 20px; text-align: center; position: relative;
-   border: 1px solid #e2e8f0; transition: all 0.3s;
- }
- .status-card:hover { transform: translateY(-5px); box-shadow: 0 15px 35px rgba(0,0,0,0.1); }
- .status-card.success { border-color: #68d391; background: linear-gradient(135deg, #f0fff4 0%, #c6f6d5 100%); }
- .status-card.warning { border-color: #fbb454; background: linear-gradient(135deg, #fffbf0 0%, #fed7aa 100%); }
- .status-card.danger { border-color: #fc8181; background: linear-gradient(135deg, #fff5f5 0%, #fed7d7 100%); }
- .status-card h3 { margin: 0 0 10px; font-size: 1.1em; color: #2d3748; }
- .status-card .value { font-size: 2.2em; font-weight: 700; color: #1a202c; margin: 10px 0; }
- .status-card .icon { position: absolute; top: 15px; right: 15px; font-size: 1.5em; opacity: 0.3; }
- .quick-actions {
-   background: white; border-radius: 20px; padding: 30px;
-   box-shadow: 0 10px 40px rgba(0,0,0,0.1);
- }
- .action-btn {
-   display: block; width: 100%; padding: 15px; margin: 10px 0;
-   background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-   color: white; border: none; border-radius: 12px; font-weight: 600;
-   font-size: 1.1em; cursor: pointer; transition: all 0.3s;
-   text-decoration: none; text-align: center;
- }
- .action-btn:hover { transform: translateY(-2px); box-shadow: 0 15px 30px rgba(102, 126, 234, 0.4); }
- .action-btn.secondary {
-   background: linear-gradient(135deg, #718096 0%, #4a5568 100%);
- }
- .section {
-   background: white; border-radius: 20px; padding: 40px; margin: 30px 0;
-   box-shadow: 0 10px 40px rgba(0,0,0,0.1);
- }
- .section-title {
-   font-size: 1.8em; font-weight: 700; color: #2d3748; margin: 0 0 30px;
-   background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-   -webkit-background-clip: text; -webkit-text-fill-color: transparent;
- }
- .form-group { margin: 25px 0; }
- .form-label {
-   display: block; font-weight: 600; margin-bottom: 8px;
-   color: #4a5568; font-size: 1em;
- }
- .form-input {
-   width: 100%; padding: 15px 20px; border: 2px solid #e2e8f0;
-   border-radius: 12px; font-size: 16px; transition: all 0.3s;
-   font-family: inherit; background: #f8fafc;
- }
- .form-input:focus {
-   outline: none; border-color: #667eea; background: white;
-   box-shadow: 0 0 0 3px rgba(102, 126, 234, 0.1);
- }
- .form-textarea {
-   resize: vertical; min-height: 120px;
- }
- .btn-primary {
-   background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-   color: white; border: none; padding: 15px 30px; border-radius: 12px;
-   cursor: pointer; font-weight: 600; font-size: 1.1em; transition: all 0.3s;
-   font-family: inherit;
- }
- .btn-primary:hover { transform: translateY(-2px); box-shadow: 0 15px 30px rgba(102, 126, 234, 0.4); }
- .btn-success { background: linear-gradient(135deg, #48bb78 0%, #38a169 100%); }
- .btn-danger { background: linear-gradient(135deg, #f56565 0%, #e53e3e 100%); }
- .booking-item {
-   background: #f8fafc; border: 2px solid #e2e8f0; border-radius: 16px;
-   padding: 25px; margin: 20px 0; transition: all 0.3s;
- }
- .booking-item:hover {
-   border-color: #667eea; box-shadow: 0 10px 25px rgba(102, 126, 234, 0.1);
-   transform: translateY(-3px);
- }
- .booking-header {
-   display: flex; justify-content: space-between; align-items: center; margin-bottom: 20px;
- }
- .participant-info h4 {
-   margin: 0 0 5px; font-size: 1.3em; color: #2d3748;
- }
- .participant-email {
-   color: #667eea; font-weight: 600; margin: 0;
- }
- .booking-date {
-   color: #718096; font-size: 0.9em; margin: 5px 0;
- }
- .preferences-grid {
-   display: grid; grid-template-columns: repeat(auto-fit, minmax(280px, 1fr));
-   gap: 15px; margin: 20px 0;
- }
- .preference-option {
-   background: white; border: 1px solid #e2e8f0; border-radius: 12px;
-   padding: 15px; position: relative; transition: all 0.3s;
- }
- .preference-option:hover {
-   border-color: #48bb78; box-shadow: 0 5px 15px rgba(72, 187, 120, 0.1);
- }
- .preference-label {
-   font-weight: 600; color: #4a5568; font-size: 0.9em; margin-bottom: 8px;
- }
- .preference-time {
-   font-size: 1.1em; color: #2d3748; margin-bottom: 15px;
- }
- .select-btn {
-   background: #48bb78; color: white; border: none; padding: 8px 16px;
-   border-radius: 8px; font-weight: 600; cursor: pointer; transition: all 0.2s;
-   font-size: 0.9em;
- }
- .select-btn:hover { background: #38a169; transform: scale(1.05); }
- .reject-all-btn {
-   background: #f56565; color: white; border: none; padding: 12px 24px;
-   border-radius: 10px; font-weight: 600; cursor: pointer; transition: all 0.3s;
- }
- .reject-all-btn:hover { background: #e53e3e; transform: translateY(-2px); }
- .remove-booking-btn {
-   background: #f56565; color: white; border: none; padding: 12px 20px;
-   border-radius: 10px; font-weight: 600; cursor: pointer; transition: all 0.3s;
-   font-size: 0.9em;
- }
- .remove-booking-btn:hover { background: #e53e3e; transform: translateY(-2px); }
- .booking-item.confirmed {
-   border-left: 4px solid #48bb78; background: linear-gradient(135deg, #f0fff4 0%, #e6fffa 100%);
- }
- .booking-time {
-   font-weight: 600; color: #2d3748; margin: 8px 0;
- }
- .calendar-id {
-   font-size: 0.8em; color: #718096; font-family: monospace;
- }
- .success-msg {
-   background: linear-gradient(135deg, #c6f6d5 0%, #9ae6b4 100%);
-   color: #22543d; border-radius: 12px; padding: 20px; margin: 25px 0;
-   font-weight: 600; border: 1px solid #68d391;
- }
- .participant-form {
-   background: linear-gradient(135deg, #f0f9ff 0%, #e0f2fe 100%);
-   border-radius: 16px; padding: 30px; margin: 20px 0;
-   border: 1px solid #bae6fd;
- }
- .participants-container { margin: 20px 0; }
- .participant-row {
-   background: white; border: 2px solid #e2e8f0; border-radius: 12px;
-   padding: 20px; margin: 15px 0; position: relative; transition: all 0.3s;
- }
- .participant-row:hover { border-color: #667eea; box-shadow: 0 5px 15px rgba(102, 126, 234, 0.1); }
- .participant-fields {
-   display: grid; grid-template-columns: 1fr 1fr; gap: 20px; margin-bottom: 15px;
- }
- .remove-participant {
-   position: absolute; top: 15px; right: 15px; background: #f56565;
-   color: white; border: none; border-radius: 50%; width: 30px; height: 30px;
-   cursor: pointer; font-weight: bold; transition: all 0.2s;
- }
- .remove-participant:hover { background: #e53e3e; transform: scale(1.1); }
- .add-participant {
-   background: linear-gradient(135deg, #48bb78 0%, #38a169 100%);
-   color: white; border: none; padding: 12px 24px; border-radius: 12px;
-   cursor: pointer; font-weight: 600; margin: 20px 0; transition: all 0.3s;
- }
- .add-participant:hover { transform: translateY(-2px); box-shadow: 0 10px 20px rgba(72, 187, 120, 0.3); }
- .batch-actions {
-   background: linear-gradient(135deg, #edf2f7 0%, #e2e8f0 100%);
-   border-radius: 12px; padding: 20px; margin: 30px 0; text-align: center;
-   border: 1px solid #cbd5e0;
- }
- @media (max-width: 1024px) {
-   .dashboard-grid { grid-template-columns: 1fr; }
-   .status-cards { grid-template-columns: 1fr 1fr; }
- }
- @media (max-width: 768px) {
-   .container { padding: 15px; }
-   .header { flex-direction: column; text-align: center; gap: 20px; }
-   .header h1 { font-size: 2.2em; }
-   .status-cards { grid-template-columns: 1fr; }
-   .preferences-grid { grid-template-columns: 1fr; }
-   .participant-fields { grid-template-columns: 1fr; }
-   .booking-header { flex-direction: column; align-items: flex-start; gap: 10px; }
- }
-</style>
-<body>
-<div class="container">
-
-<!-- Header -->
-<div class="header">
-  <h1>📅 Admin Dashboard</h1>
-  <div class="user-info">
-    <div style="font-size: 1.1em; margin-bottom: 5px;">👤 {{user_name or user_email}}</div>
-    <div style="opacity: 0.8; margin-bottom: 8px;">{{user_email}}</div>
-    <a href="/logout">🚪 Logout</a>
-  </div>
-</div>
-
-<!-- Dashboard Overview -->
-<div class="dashboard-grid">
-  <div class="status-overview">
-    <div class="status-cards">
-      <div class="status-card {% if authed %}success{% else %}danger{% endif %}">
-        <div class="icon">📅</div>
-        <h3>Calendar Status</h3>
-        <div class="value">{% if authed %}✅{% else %}❌{% endif %}</div>
-        {% if not authed %}
-        <a href="/google-auth" class="action-btn" style="padding: 8px 16px; margin: 10px 0;">Connect Now</a>
-        {% endif %}
-      </div>
-
-      <div class="status-card {% if gmail_ready %}success{% else %}warning{% endif %}">
-        <div class="icon">📧</div>
-        <h3>Email System</h3>
-        <div class="value">{% if gmail_ready %}✅{% else %}⚠️{% endif %}</div>
-        {% if not gmail_ready %}
-        <a href="/force-gmail-auth" class="action-btn" style="padding: 8px 16px; margin: 10px 0;">Fix Gmail</a>
-        {% endif %}
-      </div>
-
-      <div class="status-card {% if pending_bookings %}warning{% else %}success{% endif %}">
-        <div class="icon">⏳</div>
-        <h3>Pending Approvals</h3>
-        <div class="value">{{pending_bookings|length}}</div>
-      </div>
-    </div>
-
-    <div style="background: #f8fafc; border-radius: 12px; padding: 20px; margin-top: 20px;">
-      <h4 style="margin: 0 0 10px; color: #4a5568;">📋 Calendar Configuration</h4>
-      <code style="font-size: 0.9em; background: #e2e8f0; padding: 8px 12px; border-radius: 6px; display: block;">{{cal_id}}</code>
-    </div>
-  </div>
-
-  <div class="quick-actions">
-    <h3 style="margin: 0 0 20px; color: #2d3748;">⚡ Quick Actions</h3>
-    <a href="/admin/calendar" class="action-btn">📅 View Schedule Calendar</a>
-    <a href="#direct-booking" class="action-btn btn-success">📆 Book Participant (Direct)</a>
-    <a href="#add-participants" class="action-btn">➕ Add Participants (Link)</a>
-    <a href="#email-template" class="action-btn secondary">📝 Edit Email Template</a>
-    <a href="#consent-form" class="action-btn secondary">📋 Manage Consent Form</a>
-    <a href="/debug" class="action-btn secondary">🐛 Debug Info</a>
-  </div>
-</div>
-
-{% if success %}
-<div class="success-msg">✅ {{success}}</div>
-{% endif %}
-
-<!-- Pending Bookings -->
-{% if pending_bookings %}
-<div class="section">
-  <h2 class="section-title">⏳ Pending Booking Approvals ({{pending_bookings|length}})</h2>
-
-  <form method="post" action="/admin/bookings">
-    {% for booking in pending_bookings %}
-    <div class="booking-item">
-      <div class="booking-header">
-        <div class="participant-info">
-          <h4>{{booking.name}}</h4>
-          <p class="participant-email">{{booking.email}}</p>
-          <p class="booking-date">📅 Requested: {{booking.created_at_formatted}}</p>
-        </div>
-        <button type="submit" name="action" value="reject_{{booking.id}}" class="reject-all-btn">
-          ❌ Reject All Options
-        </button>
-      </div>
-
-      <div class="preferences-grid">
-        {% for pref in booking.preferences %}
-        <div class="preference-option">
-          <div class="preference-label">Option {{pref.option_num}}</div>
-          <div class="preference-time">{{pref.start_formatted}} – {{pref.end_formatted}}</div>
-          <button type="submit" name="action" value="approve_{{booking.id}}_{{pref.start}}_{{pref.end}}" class="select-btn">
-            ✅ Select This Time
-          </button>
-        </div>
-        {% endfor %}
-      </div>
-    </div>
-    {% endfor %}
-  </form>
-</div>
-{% endif %}
-
-<!-- Confirmed Bookings -->
-{% if confirmed_bookings %}
-<div class="section">
-  <h2 class="section-title">✅ Confirmed Bookings ({{confirmed_bookings|length}})</h2>
-
-  <form method="post" action="/admin/bookings">
-    {% for booking in confirmed_bookings %}
-    <div class="booking-item confirmed">
-      <div class="booking-header">
-        <div class="participant-info">
-          <h4>{{booking.name}}</h4>
-          <p class="participant-email">{{booking.email}}</p>
-          <p class="booking-date">✅ Confirmed: {{booking.confirmed_at_formatted}}</p>
-          <p class="booking-time">🕐 {{booking.start_formatted}} – {{booking.end_formatted}}</p>
-          {% if booking.calendar_event_id %}
-          <p class="calendar-id">📅 Calendar Event: {{booking.calendar_event_id[:20]}}...</p>
-          {% endif %}
-        </div>
-        <button type="submit" name="action" value="remove_{{booking.id}}" class="remove-booking-btn"
-                onclick="return confirm('Are you sure you want to remove this confirmed booking? This will cancel the calendar event and notify the participant.')">
-          🗑️ Remove Booking
-        </button>
-      </div>
-    </div>
-    {% endfor %}
-  </form>
-</div>
-{% endif %}
-
-<!-- Direct Booking Section -->
-<div class="section" id="direct-booking">
-  <h2 class="section-title">📅 Direct Booking with Calendar Invite</h2>
-  <p style="color: #4a5568; margin-bottom: 20px;">Book a participant directly and send them a Google Calendar invite (no preference selection needed)</p>
-
-  <div class="participant-form" style="background: linear-gradient(135deg, #e0f2fe 0%, #bae6fd 100%); border-color: #7dd3fc;">
-    <form method="post" action="/admin/direct-booking">
-      <div class="participant-fields" style="grid-template-columns: 1fr 1fr;">
-        <div class="form-group">
-          <label class="form-label">👤 Full Name</label>
-          <input name="name" class="form-input" required placeholder="Enter participant's full name">
-        </div>
-        <div class="form-group">
-          <label class="form-label">📧 Email Address</label>
-          <input type="email" name="email" class="form-input" required placeholder="participant@email.com">
-        </div>
-      </div>
-
-      <div class="participant-fields" style="grid-template-columns: 1fr 1fr;">
-        <div class="form-group">
-          <label class="form-label">📅 Start Date & Time</label>
-          <input type="datetime-local" name="start_time" class="form-input" required>
-        </div>
-        <div class="form-group">
-          <label class="form-label">🕐 End Date & Time</label>
-          <input type="datetime-local" name="end_time" class="form-input" required>
-        </div>
-      </div>
-
-      <div class="batch-actions">
-        <button type="submit" class="btn-primary btn-success">
-          📆 Create Calendar Event & Send Invite
-        </button>
-        <p style="margin: 15px 0 0; color: #4a5568; font-size: 0.95em;">
-          📧 Google Calendar invite will be sent automatically to the participant
-        </p>
-      </div>
-    </form>
-  </div>
-</div>
-
-<!-- Add Participants Section -->
-<div class="section" id="add-participants">
-  <h2 class="section-title">👥 Add Participants (Send Booking Link)</h2>
-  <p style="color: #4a5568; margin-bottom: 20px;">Send participants a booking link to let them choose their preferred time slots</p>
-
-  <div class="participant-form">
-    <form method="post" action="/admin/participants/batch" id="participantForm">
-      <div id="participantsContainer" class="participants-container">
-        <div class="participant-row">
-          <div class="participant-fields">
-            <div class="form-group">
-              <label class="form-label">👤 Full Name</label>
-              <input name="names[]" class="form-input" required placeholder="Enter participant's full name">
-            </div>
-            <div class="form-group">
-              <label class="form-label">📧 Email Address</label>
-              <input type="email" name="emails[]" class="form-input" required placeholder="participant@email.com">
-            </div>
-          </div>
-        </div>
-      </div>
-
-      <button type="button" class="add-participant" onclick="addParticipant()">
-        ➕ Add Another Participant
-      </button>
-
-      <div class="batch-actions">
-        <button type="submit" class="btn-primary">
-          📤 Create All Booking Links & Send Emails
-        </button>
-        <p style="margin: 15px 0 0; color: #4a5568; font-size: 0.95em;">
-          📧 Emails will be sent automatically to all participants
-        </p>
-      </div>
-    </form>
-  </div>
-</div>
-
-<!-- Email Template Section -->
-<div class="section" id="email-template">
-  <h2 class="section-title">📝 Email Template Configuration</h2>
-
-  <form method="post" action="/admin/email">
-    <div class="form-group">
-      <label class="form-label">Email Body Template</label>
-      <p style="color: #718096; font-size: 0.9em; margin-bottom: 10px;">
-        Use <code>{{name}}</code> for participant name and <code>{{link}}</code> for booking link
-      </p>
-      <textarea name="body" class="form-input form-textarea" rows="8" placeholder="Hi {{name}}, please book your slot: {{link}}">{{ email_body }}</textarea>
-    </div>
-    <button type="submit" class="btn-primary">💾 Save Email Template</button>
-  </form>
-</div>
-
-<!-- Consent Form Section -->
-<div class="section" id="consent-form">
-  <h2 class="section-title">📋 Consent Form Management</h2>
-
-  <form method="post" action="/admin/consent" style="margin-bottom: 30px;">
-    <div class="form-group">
-      <label class="form-label">HTML Content</label>
-      <p style="color: #718096; font-size: 0.9em; margin-bottom: 10px;">
-        Participants will see this before booking their time slots
-      </p>
-      <textarea name="html" class="form-input form-textarea" rows="8" placeholder="<h2>Research Study Consent</h2><p>Your consent form content here...</p>">{{ consent_html }}</textarea>
-    </div>
-    <button type="submit" class="btn-primary">💾 Save HTML Consent</button>
-  </form>
-
-  <form method="post" action="/admin/upload-consent" enctype="multipart/form-data">
-    <div class="form-group">
-      <label class="form-label">Upload Consent Document</label>
-      <p style="color: #718096; font-size: 0.9em; margin-bottom: 10px;">
-        Upload PDF, DOC, or DOCX files (max 16MB)
-      </p>
-      <input type="file" name="consent_file" accept=".pdf,.doc,.docx" required class="form-input" style="padding: 10px;">
-    </div>
-    <button type="submit" class="btn-primary">📤 Upload Consent File</button>
-    <p style="color: #718096; font-size: 0.9em; margin-top: 10px;">
-      🔗 Uploaded files will be available at <a href="/consent" target="_blank" style="color: #667eea;">/consent</a>
-    </p>
-
-    {% if consent_files %}
-    <div style="margin-top: 30px; padding-top: 20px; border-top: 2px solid #e2e8f0;">
-      <h4 style="color: #2d3748; margin: 0 0 20px;">📁 Uploaded Documents</h4>
-      {% for file in consent_files %}
-      <div style="background: #f8fafc; border: 1px solid #e2e8f0; border-radius: 8px; padding: 15px; margin: 10px 0; display: flex; justify-content: space-between; align-items: center;">
-        <a href="/uploads/{{file.filename}}" target="_blank" style="color: #667eea; font-weight: 600; text-decoration: none;">
-          📎 {{file.original_name}}
-        </a>
-        <span style="color: #718096; font-size: 0.9em;">{{file.upload_date}}</span>
-      </div>
-      {% endfor %}
-    </div>
-    {% endif %}
-  </form>
-</div>
-
-</div>
-
-<script>
-function addParticipant() {
-  const container = document.getElementById('participantsContainer');
-  const newRow = document.createElement('div');
-  newRow.className = 'participant-row';
-  newRow.innerHTML = `
-    <button type="button" class="remove-participant" onclick="removeParticipant(this)" title="Remove participant">×</button>
-    <div class="participant-fields">
-      <div class="form-group">
-        <label class="form-label">👤 Full Name</label>
-        <input name="names[]" class="form-input" required placeholder="Enter participant's full name">
-      </div>
-      <div class="form-group">
-        <label class="form-label">📧 Email Address</label>
-        <input type="email" name="emails[]" class="form-input" required placeholder="participant@email.com">
-      </div>
-    </div>
-  `;
-  container.appendChild(newRow);
-}
-
-function removeParticipant(button) {
-  const participantRows = document.querySelectorAll('.participant-row');
-  if (participantRows.length > 1) {
-    button.parentElement.remove();
-  } else {
-    alert('You must have at least one participant.');
-  }
-}
-</script>
-
-</body>
-"""
-
 @app.get("/admin")
 @require_auth
 def admin():
-    authed = have_token()
+    authed, gmail_ready = google_auth_state()
 
-    # Check if we need Gmail permissions
-    gmail_ready = False
-    if authed:
-        try:
-            creds = get_creds()
-            if creds and creds.valid and creds.scopes:
-                gmail_ready = 'https://www.googleapis.com/auth/gmail.send' in creds.scopes
-        except:
-            pass
+    # Unchanged since the browser's last copy: skip the queries and the render
+    user = {k: session.get(k, '') for k in ('user_email', 'user_name', 'user_org')}
+    etag = admin_page_etag(authed, gmail_ready, *user.values())
+    if etag in request.if_none_match:
+        return admin_page_response("", etag, 304)
 
     msg = request.args.get("msg", "")
-    success = ""
-    if msg == "email_saved":
-        success = "Email template saved successfully!"
-    elif msg == "consent_saved":
-        success = "Consent form saved successfully!"
-    elif msg == "file_uploaded":
-        success = "Consent file uploaded successfully!"
-    elif msg == "no_file":
-        success = "Please select a file to upload."
-    elif msg == "invalid_file":
-        success = "Invalid file type. Please upload PDF, DOC, or DOCX files."
-    elif msg == "booking_approved":
-        success = "Booking approved and calendar invitation sent!"
-    elif msg == "booking_rejected":
-        success = "Booking rejected successfully."
-    elif msg == "booking_removed":
-        success = "Confirmed booking removed successfully. Calendar event deleted and participant notified."
-    elif msg == "booking_not_found":
-        success = "Booking not found or not confirmed."
-    elif msg == "removal_failed":
-        success = "Failed to remove booking. Please try again."
-    elif msg == "direct_booking_success":
-        success = "Participant booked successfully! Google Calendar invite has been sent."
-    elif msg == "direct_booking_failed":
-        success = "Failed to create booking. Please try again."
-    elif msg == "missing_fields":
-        success = "Please fill in all required fields."
-    elif msg == "invalid_time_range":
-        success = "End time must be after start time."
+    success = ADMIN_MESSAGES.get(msg, "")
 
     # Get pending bookings with formatted times
     pending_bookings = []
-    for booking in get_pending_bookings():
-        created_dt = datetime.fromisoformat(booking['created_at'])
-
-        formatted_booking = dict(booking)
-        formatted_booking['created_at_formatted'] = created_dt.strftime('%m/%d %I:%M %p').replace(' 0', ' ')
-
-        # Format all 3 time slot preferences
-        preferences = []
-        for i in range(1, 4):
-            start_key = f'preference{i}_start'
-            end_key = f'preference{i}_end'
-            if booking[start_key] and booking[end_key]:
-                start_dt = datetime.fromisoformat(booking[start_key])
-                end_dt = datetime.fromisoformat(booking[end_key])
-                pref = {
-                    'start': booking[start_key],
-                    'end': booking[end_key],
-                    'start_formatted': start_dt.strftime('%a %b %d, %I:%M %p').replace(' 0', ' '),
-                    'end_formatted': end_dt.strftime('%I:%M %p').replace(' 0', ' '),
-                    'option_num': i
-                }
-                preferences.append(pref)
-
-        formatted_booking['preferences'] = preferences
-        pending_bookings.append(formatted_booking)
+    for booking, booking_prefs in get_pending_bookings():
+        # Time labels come preformatted from the query
+        preferences = [{
+            'start': start,
+            'end': end,
+            'start_formatted': start_label,
+            'end_formatted': end_label,
+            'option_num': i
+        } for i, start, end, start_label, end_label in booking_prefs]
+
+        pending_bookings.append(BookingView(
+            id=booking['id'],
+            name=booking['name'],
+            email=booking['email'],
+            calendar_event_id=booking['calendar_event_id'],
+            preferences=preferences,
+            created_at_formatted=booking['created_label'],
+        ))
 
     # Get confirmed bookings
     confirmed_bookings = []
@@ -1640,32 +1590,33 @@ def admin():
 
         for booking in bookings:
             confirmed_dt = datetime.fromisoformat(booking['admin_confirmed_at']) if booking['admin_confirmed_at'] else None
-            start_dt = datetime.fromisoformat(booking['selected_start_time'])
-            end_dt = datetime.fromisoformat(booking['selected_end_time'])
-
-            formatted_booking = dict(booking)
-            formatted_booking['confirmed_at_formatted'] = confirmed_dt.strftime('%m/%d %I:%M %p').replace(' 0', ' ') if confirmed_dt else 'N/A'
-            formatted_booking['start_formatted'] = start_dt.strftime('%a %b %d, %I:%M %p').replace(' 0', ' ')
-            formatted_booking['end_formatted'] = end_dt.strftime('%I:%M %p').replace(' 0', ' ')
-
-            confirmed_bookings.append(formatted_booking)
-
-    return render_template_string(
-        ADMIN_HTML,
+            start_formatted, end_formatted = slot_labels(booking['selected_start_time'], booking['selected_end_time'])
+
+            confirmed_bookings.append(BookingView(
+                id=booking['id'],
+                name=booking['name'],
+                email=booking['email'],
+                calendar_event_id=booking['calendar_event_id'],
+                confirmed_at_formatted=confirmed_dt.strftime(STAMP_FMT) if confirmed_dt else 'N/A',
+                start_formatted=start_formatted,
+                end_formatted=end_formatted,
+            ))
+
+    return admin_page_response(render_template(
+        "admin.html",
         title=APP_TITLE,
         cal_id=CALENDAR_ID or "(missing)",
         authed=authed,
         gmail_ready=gmail_ready,
         email_body=get_setting("email_body"),
         consent_html=get_setting("consent_html"),
-        consent_files=get_consent_files(),
+        consent_files=get_consent_files(before=request.args.get("files_before", type=int)),
+        consent_files_page=CONSENT_FILES_PAGE,
         pending_bookings=pending_bookings,
         confirmed_bookings=confirmed_bookings,
         success=success,
-        user_email=session.get('user_email', ''),
-        user_name=session.get('user_name', ''),
-        user_org=session.get('user_org', ''),
-    )
+        **user,
+    ), etag)
 
 @app.post("/admin/email")
 @require_auth
@@ -1677,6 +1628,7 @@ def admin_email():
 @require_auth
 def admin_consent():
     set_setting("consent_html", request.form.get("html",""))
+    invalidate_consent_page()
     return redirect(url_for("admin") + "?msg=consent_saved")
 
 @app.post("/admin/upload-consent")
@@ -1691,14 +1643,17 @@ def upload_consent():
 
     if file and allowed_file(file.filename):
         # Generate secure filename
-        filename = f"consent_{secrets.token_hex(8)}.{file.filename.rsplit('.', 1)[1].lower()}"
+        extension = file.filename.rsplit('.', 1)[1].lower()
+        filename = f"consent_{rand_bytes(8).hex()}.{extension}"
         file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
+        # Copy out of Werkzeug's spooled upload in 1 MiB chunks (default is 16 KiB)
+        file.save(file_path, buffer_size=UPLOAD_COPY_BUFFER)
 
         # Save to database
         with db() as con:
             con.execute("INSERT INTO consent_files(filename, original_name) VALUES(?,?)",
                        (filename, file.filename))
+        invalidate_consent_page()
 
         return redirect(url_for("admin") + "?msg=file_uploaded")
 
@@ -1724,22 +1679,33 @@ def admin_bookings():
         selected_start = parts[2]
         selected_end = parts[3]
 
-        # Get booking details
-        with db() as con:
-            booking = con.execute("""
-                SELECT b.*, p.name, p.email
-                FROM bookings b
-                JOIN participants p ON b.participant_id = p.id
-                WHERE b.id = ? AND b.status = 'pending'
-            """, (booking_id,)).fetchone()
-
+        # Look up the booking and claim the slot in one transaction, before creating
+        # the event, so two approvals of the same time can't both go through
+        try:
+            with db() as con:
+                con.execute("BEGIN IMMEDIATE")
+                booking = con.execute("""
+                    SELECT p.name, p.email
+                    FROM bookings b
+                    JOIN participants p ON b.participant_id = p.id
+                    WHERE b.id = ? AND b.status = 'pending'
+                """, (booking_id,)).fetchone()
+                if booking:
+                    con.execute("""
+                        UPDATE bookings
+                        SET status = 'confirmed',
+                            selected_start_time = ?,
+                            selected_end_time = ?,
+                            admin_confirmed_at = CURRENT_TIMESTAMP
+                        WHERE id = ?
+                    """, (selected_start, selected_end, booking_id))
+        except sqlite3.IntegrityError:
+            return redirect(url_for("admin") + "?msg=slot_taken")
         if not booking:
             return redirect(url_for("admin"))
 
         # Create calendar event with selected time
-        start_dt = datetime.fromisoformat(selected_start)
-        end_dt = datetime.fromisoformat(selected_end)
-
+        created = None
         try:
             print(f"[DEBUG] Attempting to approve booking {booking_id}")
             print(f"[DEBUG] Selected time: {selected_start} to {selected_end}")
@@ -1751,8 +1717,10 @@ def admin_bookings():
             event = {
                 "summary": f"User Study — {booking['name']}",
                 "description": f"Participant: {booking['name']} <{booking['email']}>\nConsent: {HOST_BASE}/consent\n\nStatus: CONFIRMED by Admin",
-                "start": {"dateTime": to_iso_utc(start_dt), "timeZone": "UTC"},
-                "end":   {"dateTime": to_iso_utc(end_dt),   "timeZone": "UTC"},
+                # Stored slot times are RFC 3339 already; a time without an offset
+                # is read in the study's time zone
+                "start": {"dateTime": selected_start, "timeZone": TZ.key},
+                "end":   {"dateTime": selected_end,   "timeZone": TZ.key},
                 "attendees": [{"email": booking["email"]}],
             }
             print(f"[DEBUG] Event object created: {event}")
@@ -1763,7 +1731,8 @@ def admin_bookings():
                 created = svc.events().insert(
                     calendarId=calendar_id_to_use,
                     body=event,
-                    sendUpdates="all"
+                    sendUpdates="all",
+                    fields="id",  # only the event id is used
                 ).execute()
                 print(f"[DEBUG] Calendar event created: {created.get('id')} on calendar: {calendar_id_to_use}")
             except Exception as calendar_error:
@@ -1772,28 +1741,22 @@ def admin_bookings():
                     created = svc.events().insert(
                         calendarId="primary",
                         body=event,
-                        sendUpdates="all"
+                        sendUpdates="all",
+                        fields="id",  # only the event id is used
                     ).execute()
                     print(f"[DEBUG] Calendar event created on primary calendar: {created.get('id')}")
                 else:
                     raise calendar_error
 
-            # Update booking status with selected time
+            # Record the event on the claimed booking
             with db() as con:
-                con.execute("""
-                    UPDATE bookings
-                    SET status = 'confirmed',
-                        selected_start_time = ?,
-                        selected_end_time = ?,
-                        calendar_event_id = ?,
-                        admin_confirmed_at = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                """, (selected_start, selected_end, created['id'], booking_id))
+                con.execute("UPDATE bookings SET calendar_event_id = ? WHERE id = ?",
+                            (created['id'], booking_id))
             print(f"[DEBUG] Database updated successfully")
+            invalidate_busy_cache()
 
-            # Send confirmation email
-            email_result = send_confirmation_email(booking['email'], booking['name'], selected_start, selected_end)
-            print(f"[DEBUG] Confirmation email result: {email_result}")
+            # The booking is confirmed; the email can go out after the redirect
+            run_in_background(send_confirmation_email, booking['email'], booking['name'], selected_start, selected_end)
 
             return redirect(url_for("admin") + "?msg=booking_approved")
 
@@ -1801,6 +1764,17 @@ def admin_bookings():
             import traceback
             print(f"[BOOKING APPROVAL ERROR] {e}")
             print(f"[BOOKING APPROVAL ERROR TRACEBACK] {traceback.format_exc()}")
+            if created is None:
+                # No event was made, so release the slot again
+                with db() as con:
+                    con.execute("""
+                        UPDATE bookings
+                        SET status = 'pending',
+                            selected_start_time = NULL,
+                            selected_end_time = NULL,
+                            admin_confirmed_at = NULL
+                        WHERE id = ?
+                    """, (booking_id,))
             return redirect(url_for("admin"))
 
     elif action.startswith("reject_"):
@@ -1866,86 +1840,26 @@ def admin_bookings():
                         calendar_event_id = NULL
                     WHERE id = ?
                 """, (booking_id,))
+            invalidate_busy_cache()
 
-            # Send notification email to participant
-            try:
-                selected_start = booking['selected_start_time']
-                selected_end = booking['selected_end_time']
-                start_dt = datetime.fromisoformat(selected_start)
-                end_dt = datetime.fromisoformat(selected_end)
-                start_str = start_dt.strftime('%a %b %d, %I:%M %p').replace(' 0', ' ')
-                end_str = end_dt.strftime('%I:%M %p').replace(' 0', ' ')
-
-                # Create cancellation email
-                subject = "❌ User Study Booking CANCELLED - Important Update"
-
-                body = f"""Hi {booking['name']},
-
-We regret to inform you that your confirmed booking has been cancelled by our admin team.
-
-❌ CANCELLED APPOINTMENT:
-{start_str} – {end_str} (Toronto time)
-
-🗑️ WHAT'S BEEN DONE:
-• The calendar event has been removed from your calendar
-• Your booking slot is now available for other participants
-• You'll no longer receive reminders for this session
-
-📧 NEXT STEPS:
-If you have any questions or would like to reschedule, please reply to this email.
-
-Thank you for your understanding.
-
-Best regards,
-The Research Team
-
----
-User Study Booking System"""
-
-                # Use the same email sending logic as confirmation emails
-                result = send_email_with_gmail_api(booking['email'], booking['name'], subject, body)
-
-                if result != "SUCCESS":
-                    # Fallback to SMTP if available
-                    if SMTP_HOST:
-                        try:
-                            msg = EmailMessage()
-                            msg["From"] = SMTP_FROM
-                            msg["To"] = f"{booking['name']} <{booking['email']}>"
-                            msg["Subject"] = subject
-                            msg.set_content(body)
-
-                            with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=30) as s:
-                                s.starttls()
-                                if SMTP_USER and SMTP_PASS:
-                                    s.login(SMTP_USER, SMTP_PASS)
-                                s.send_message(msg)
-                            print(f"[DEBUG] Cancellation email sent via SMTP to {booking['email']}")
-                        except Exception as smtp_error:
-                            print(f"[WARNING] SMTP cancellation email failed: {smtp_error}")
-                    else:
-                        print(f"[DEBUG] DRY-RUN cancellation email for {booking['email']}")
-                else:
-                    print(f"[DEBUG] Cancellation email sent via Gmail API to {booking['email']}")
-
-            except Exception as email_error:
-                print(f"[WARNING] Failed to send cancellation email: {email_error}")
+            # Let the participant know once the response has gone out
+            run_in_background(send_cancellation_email, booking['email'], booking['name'],
+                              booking['selected_start_time'], booking['selected_end_time'])
 
             # Check if request came from calendar view
             referer = request.headers.get('Referer', '')
-            if '/admin/calendar' in referer:
-                # Extract week parameter if present
-                from urllib.parse import urlparse, parse_qs
-                parsed_url = urlparse(referer)
-                query_params = parse_qs(parsed_url.query)
-                week = query_params.get('week', ['0'])[0]
+            if '/admin/calendar' not in referer:
+                return redirect(url_for("admin") + "?msg=booking_removed")
+
+            # Extract week parameter if present
+            week = 0
+            if 'week=' in referer:
+                query_params = parse_qs(urlparse(referer).query)
                 try:
-                    week = int(week)
+                    week = int(query_params.get('week', ['0'])[0])
                 except (ValueError, TypeError):
                     week = 0
-                return redirect(url_for("admin_calendar", week=week, msg="booking_removed"))
-            else:
-                return redirect(url_for("admin") + "?msg=booking_removed")
+            return redirect(url_for("admin_calendar", week=week, msg="booking_removed"))
 
         except Exception as e:
             import traceback
@@ -1955,22 +1869,30 @@ User Study Booking System"""
 
     return redirect(url_for("admin"))
 
+# One admin calendar cell; start/end are Markup-safe ISO timestamps
+AdminSlot = namedtuple("AdminSlot", "status start end booking is_blocked")
+AdminDay = namedtuple("AdminDay", "header slots")
+# A confirmed booking shown on the admin calendar; name/email are raw (escape when rendering)
+CalendarBooking = namedtuple(
+    "CalendarBooking",
+    "id name email start end start_ts end_ts start_formatted end_formatted calendar_event_id")
+
 def generate_calendar_slots_html(calendar_days):
     """Generate HTML for calendar time slots"""
-    html = ""
+    parts = []
     for hour in range(9, 25):
-        html += f'<div class="time-label">{hour}:00</div>'
+        parts.append(f'<div class="time-label">{hour}:00</div>')
         for day in calendar_days:
-            slot = day["slots"][hour-9]
-            html += f'''
-            <div class="time-slot {slot["status"]}"
-                 data-start="{slot["start"]}"
-                 data-end="{slot["end"]}">
+            slot = day.slots[hour-9]
+            parts.append(f'''
+            <div class="time-slot {slot.status}"
+                 data-start="{slot.start}"
+                 data-end="{slot.end}">
               <div class="slot-content">
                 {get_slot_content(slot)}
               </div>
-            </div>'''
-    return html
+            </div>''')
+    return "".join(parts)
 
 @app.get("/admin/calendar")
 @require_auth
@@ -1986,13 +1908,10 @@ def admin_calendar():
     elif week_offset > 12:  # Show more weeks for admin
         week_offset = 12
 
-    # Calculate the start date for the requested week
-    today_local = datetime.now(TZ).replace(hour=0, minute=0, second=0, microsecond=0)
-    week_start = today_local + timedelta(days=week_offset * 7)
-    days_from_monday = week_start.weekday()
-    week_start = week_start - timedelta(days=days_from_monday)
-
+    # Calculate the requested week; slot checks below compare epoch seconds
     now_local = datetime.now(TZ)
+    now_ts = now_local.timestamp()
+    week_start, week_end = invite_week_window((now_local + timedelta(days=week_offset * 7)).date())
 
     # Get calendar service
     try:
@@ -2003,105 +1922,77 @@ def admin_calendar():
         service = None
         calendar_available = False
 
-    # Get all blocked slots
-    blocked_slots = []
-    with db() as con:
-        slots = con.execute("SELECT start_time, end_time FROM blocked_slots").fetchall()
-        for slot in slots:
-            blocked_slots.append({
-                'start': datetime.fromisoformat(slot['start_time']),
-                'end': datetime.fromisoformat(slot['end_time'])
-            })
+    # Blocked slots for this week, matched by exact slot bounds
+    blocked_slots = get_blocked_slot_keys(week_start, week_end)
 
     # Get all confirmed bookings for this week
-    week_end = week_start + timedelta(days=7)
     confirmed_bookings = []
     if calendar_available:
         with db() as con:
+            # Selected times are stored as Toronto-local ISO strings, so the week
+            # window can be compared as text and filtered by SQLite directly
             bookings = con.execute("""
                 SELECT b.*, p.name, p.email
                 FROM bookings b
                 JOIN participants p ON b.participant_id = p.id
                 WHERE b.status = 'confirmed'
-                AND b.selected_start_time IS NOT NULL
+                AND b.selected_start_time >= ?
+                AND b.selected_start_time < ?
                 AND b.selected_end_time IS NOT NULL
-            """).fetchall()
+                ORDER BY b.selected_start_time ASC
+            """, (week_start.isoformat(), week_end.isoformat())).fetchall()
 
             for booking in bookings:
                 start_dt = datetime.fromisoformat(booking['selected_start_time'])
                 end_dt = datetime.fromisoformat(booking['selected_end_time'])
 
-                # Check if this booking falls within the current week
-                if week_start <= start_dt < week_end:
-                    # Safely get calendar_event_id
-                    try:
-                        calendar_event_id = booking['calendar_event_id'] or ''
-                    except (KeyError, TypeError):
-                        calendar_event_id = ''
-
-                    confirmed_bookings.append({
-                        'id': booking['id'],
-                        'name': booking['name'],
-                        'email': booking['email'],
-                        'start': start_dt,
-                        'end': end_dt,
-                        'start_formatted': start_dt.strftime('%a %m/%d %I:%M %p').replace(' 0', ' '),
-                        'end_formatted': end_dt.strftime('%I:%M %p').replace(' 0', ' '),
-                        'calendar_event_id': calendar_event_id
-                    })
-
-    # Fetch busy blocks for entire week with ONE API call
-    busy_blocks = []
+                confirmed_bookings.append(CalendarBooking(
+                    id=booking['id'],
+                    name=booking['name'],
+                    email=booking['email'],
+                    start=start_dt,
+                    end=end_dt,
+                    start_ts=start_dt.timestamp(),
+                    end_ts=end_dt.timestamp(),
+                    start_formatted=start_dt.strftime(CALENDAR_SLOT_FMT),
+                    end_formatted=end_dt.strftime(SLOT_END_FMT),
+                    calendar_event_id=booking['calendar_event_id'] or ''
+                ))
+
+    # Busy intervals for the entire week from one (cached) FreeBusy lookup,
+    # shared with the invite page for the same week
+    busy_intervals = BusyIntervals((), ())
     if calendar_available:
         try:
-            week_start_utc = to_iso_utc(week_start)
-            week_end_utc = to_iso_utc(week_end)
-            busy_blocks = freebusy_blocks(service, week_start_utc, week_end_utc)
-            print(f"[ADMIN CALENDAR] Fetched {len(busy_blocks)} busy blocks for the week")
+            busy_intervals = get_busy_intervals(service, week_start, week_end)
+            print(f"[ADMIN CALENDAR] Fetched {len(busy_intervals.starts)} busy blocks for the week")
         except Exception as e:
             print(f"[ADMIN CALENDAR] Error fetching busy blocks: {e}")
             calendar_available = False
 
-    # Generate calendar data (similar to invite function but with booking info)
+    # Generate calendar data from the invite page's cached week skeleton, whose
+    # slot bounds are already formatted and converted to epochs
+    day_headers, skeleton_rows = _week_skeleton(week_start.date())
     calendar_days = []
-    for d in range(7):
-        day = week_start + timedelta(days=d)
-        day_header = day.strftime("%a %m/%d").replace(" 0", " ")
-
+    for header, day_column in zip(day_headers, zip(*(slots for _, slots in skeleton_rows))):
         day_slots = []
-        for hour in range(9, 25):
-            if hour == 24:
-                # Handle midnight as hour 0 of next day
-                start = (day + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=TZ)
-            else:
-                start = day.replace(hour=hour, minute=0, second=0, microsecond=0, tzinfo=TZ)
-            end = start + timedelta(hours=1)
+        for start_iso, end_iso, start_ts, end_ts in day_column:
 
             # Find any confirmed booking for this slot
             slot_booking = None
             for booking in confirmed_bookings:
-                if booking['start'] <= start < booking['end']:
+                if booking.start_ts <= start_ts < booking.end_ts:
                     slot_booking = booking
                     break
 
             # Check if slot is blocked
-            is_blocked = False
-            for blocked in blocked_slots:
-                if blocked['start'] <= start < blocked['end']:
-                    is_blocked = True
-                    break
+            is_blocked = (start_iso, end_iso) in blocked_slots
 
-            # Check if slot is busy in Google Calendar (from cached busy_blocks)
-            is_calendar_busy = False
-            for busy in busy_blocks:
-                busy_start = parse_iso(busy["start"]).astimezone(TZ)
-                busy_end = parse_iso(busy["end"]).astimezone(TZ)
-                if not (end <= busy_start or start >= busy_end):
-                    is_calendar_busy = True
-                    break
+            # Check if slot is busy in Google Calendar
+            is_calendar_busy = overlaps_busy(busy_intervals, start_ts, end_ts)
 
             # Determine slot status
-            if start <= now_local:
+            if start_ts <= now_ts:
                 status = "past"
             elif slot_booking:
                 status = "booked"
@@ -2114,23 +2005,13 @@ def admin_calendar():
             else:
                 status = "available"
 
-            day_slots.append({
-                "status": status,
-                "start": start.isoformat(),
-                "end": end.isoformat(),
-                "booking": slot_booking,
-                "is_blocked": is_blocked
-            })
-
-        calendar_days.append({
-            "header": day_header,
-            "slots": day_slots
-        })
+            # ISO timestamps hold no HTML metacharacters, so mark them safe up front
+            day_slots.append(AdminSlot(status, Markup(start_iso), Markup(end_iso), slot_booking, is_blocked))
+
+        calendar_days.append(AdminDay(header, day_slots))
 
     # Generate week label and navigation
-    start_date = week_start.strftime("%b %d").replace(" 0", " ")
-    end_date = (week_start + timedelta(days=6)).strftime("%b %d").replace(" 0", " ")
-    current_week_label = f"{start_date} - {end_date}"
+    current_week_label = week_label(week_start.date())
 
     prev_week_url = None
     next_week_url = url_for('admin_calendar', week=week_offset+1) if week_offset < 12 else None
@@ -2140,13 +2021,7 @@ def admin_calendar():
 
     # Generate the admin calendar HTML template
     # Generate success message if any
-    success_msg = ""
-    if msg == "booking_removed":
-        success_msg = "✅ Booking removed successfully. Calendar event deleted and participant notified."
-    elif msg == "slot_blocked":
-        success_msg = "✅ Time slot blocked successfully."
-    elif msg == "slot_unblocked":
-        success_msg = "✅ Time slot unblocked successfully."
+    success_msg = ADMIN_CALENDAR_MESSAGES.get(msg, "")
 
     return generate_admin_calendar_html(
         current_week_label,
@@ -2158,11 +2033,17 @@ def admin_calendar():
         success_msg
     )
 
+ADMIN_CALENDAR_MESSAGES = {
+    "booking_removed": "✅ Booking removed successfully. Calendar event deleted and participant notified.",
+    "slot_blocked": "✅ Time slot blocked successfully.",
+    "slot_unblocked": "✅ Time slot unblocked successfully.",
+}
+
 def generate_admin_calendar_html(current_week_label, week_offset, prev_week_url, next_week_url, calendar_days, confirmed_bookings, success_msg=""):
     """Generate the complete admin calendar HTML"""
 
     # Generate day headers
-    day_headers = "".join(f'<div class="day-header">{day["header"]}</div>' for day in calendar_days)
+    day_headers = "".join(f'<div class="day-header">{day.header}</div>' for day in calendar_days)
 
     # Generate calendar slots
     calendar_slots = generate_calendar_slots_html(calendar_days)
@@ -2175,14 +2056,14 @@ def generate_admin_calendar_html(current_week_label, week_offset, prev_week_url,
     if confirmed_bookings:
         booking_html = '<div class="booking-list">'
         for booking in confirmed_bookings:
-            calendar_event_id = booking.get("calendar_event_id", "") or ""
+            calendar_event_id = booking.calendar_event_id
             calendar_id_short = calendar_event_id[:15] + "..." if calendar_event_id else "N/A"
             booking_html += f'''
             <div class="booking-item info-only">
               <div class="booking-info">
-                <h4>{booking["name"]}</h4>
-                <p class="email">{booking["email"]}</p>
-                <p class="time">{booking["start_formatted"]} – {booking["end_formatted"]}</p>
+                <h4>{escape(booking.name)}</h4>
+                <p class="email">{escape(booking.email)}</p>
+                <p class="time">{booking.start_formatted} – {booking.end_formatted}</p>
                 <p class="calendar-id">📅 Event: {calendar_id_short}</p>
               </div>
               <div class="booking-note">
@@ -2202,9 +2083,7 @@ def generate_admin_calendar_html(current_week_label, week_offset, prev_week_url,
     <!doctype html><meta charset="utf-8">
     <title>Admin Calendar · {APP_TITLE}</title>
     <meta name="viewport" content="width=device-width, initial-scale=1">
-    <style>
-    {get_admin_calendar_styles()}
-    </style>
+    <link rel="stylesheet" href="{asset_url('admin_calendar.css')}">
     <body>
     <div class="container">
 
@@ -2270,231 +2149,62 @@ def generate_admin_calendar_html(current_week_label, week_offset, prev_week_url,
     </body>
     """
 
-def get_slot_content(slot):
-    if slot["status"] == "booked" and slot["booking"]:
-        booking = slot["booking"]
-        return f'''
+# Per-status slot markup for the admin calendar, compiled once with the app's
+# autoescaping Jinja environment
+_SLOT_TEMPLATES = {
+    "booked": app.jinja_env.from_string('''
         <form method="post" action="/admin/bookings" class="slot-form">
-            <button type="submit" name="action" value="remove_{booking["id"]}" class="booking-slot-btn"
-                    onclick="return confirm('Remove {booking["name"]}\\'s confirmed booking?\\n\\nThis will:\\n• Cancel the calendar event\\n• Notify the participant\\n• Free up this time slot')">
-                <div class="booking-label">{booking["name"]}</div>
-                <div class="booking-time">{booking["start"].strftime("%I:%M").lstrip("0")}–{booking["end"].strftime("%I:%M").lstrip("0")}</div>
+            <button type="submit" name="action" value="remove_{{ booking.id }}" class="booking-slot-btn"
+                    onclick='return confirm({{ ("Remove " ~ booking.name ~ "\'s confirmed booking?\\n\\nThis will:\\n• Cancel the calendar event\\n• Notify the participant\\n• Free up this time slot")|tojson }})'>
+                <div class="booking-label">{{ booking.name }}</div>
+                <div class="booking-time">{{ booking.start.strftime("%I:%M").lstrip("0") }}–{{ booking.end.strftime("%I:%M").lstrip("0") }}</div>
                 <div class="remove-indicator">🗑️ Click to remove</div>
             </button>
         </form>
-        '''
-    elif slot["status"] == "blocked":
-        return f'''
+        '''),
+    "blocked": app.jinja_env.from_string('''
         <form method="post" action="/admin/unblock-slot" class="slot-form">
-            <input type="hidden" name="start_time" value="{slot["start"]}">
-            <input type="hidden" name="end_time" value="{slot["end"]}">
+            <input type="hidden" name="start_time" value="{{ slot.start }}">
+            <input type="hidden" name="end_time" value="{{ slot.end }}">
             <button type="submit" class="block-slot-btn blocked"
                     onclick="return confirm('Unblock this time slot?')">
                 <div class="block-label">🚫 Blocked</div>
                 <div class="block-indicator">Click to unblock</div>
             </button>
         </form>
-        '''
-    elif slot["status"] == "available":
-        return f'''
+        '''),
+    "available": app.jinja_env.from_string('''
         <form method="post" action="/admin/block-slot" class="slot-form">
-            <input type="hidden" name="start_time" value="{slot["start"]}">
-            <input type="hidden" name="end_time" value="{slot["end"]}">
+            <input type="hidden" name="start_time" value="{{ slot.start }}">
+            <input type="hidden" name="end_time" value="{{ slot.end }}">
             <button type="submit" class="block-slot-btn available"
                     onclick="return confirm('Block this time slot?\\n\\nThis will make it unavailable for participants.')">
                 <div class="available-label">✅</div>
                 <div class="block-indicator">Click to block</div>
             </button>
         </form>
-        '''
-    elif slot["status"] == "unavailable":
-        return "❌"
-    else:
-        return "⏰"
-
-def get_admin_calendar_styles():
-    return """
-    * { box-sizing: border-box; }
-    body {
-      font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, system-ui, sans-serif;
-      margin: 0; padding: 0; min-height: 100vh;
-      background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-    }
-    .container { max-width: 1400px; margin: 0 auto; padding: 20px; }
-    .header {
-      background: rgba(255,255,255,0.1); backdrop-filter: blur(20px);
-      border-radius: 20px; padding: 30px; margin-bottom: 30px;
-      color: white; display: flex; justify-content: space-between; align-items: center;
-    }
-    .header h1 { margin: 0; font-size: 2.5em; font-weight: 700; }
-    .action-btn {
-      background: rgba(255,255,255,0.2); color: white; padding: 12px 20px;
-      border-radius: 10px; text-decoration: none; font-weight: 600; transition: all 0.3s;
-    }
-    .action-btn:hover { background: rgba(255,255,255,0.3); transform: translateY(-2px); }
-    .action-btn.secondary { background: rgba(255,255,255,0.15); }
-    .calendar-header {
-      background: white; border-radius: 16px; padding: 25px; margin-bottom: 20px;
-      box-shadow: 0 10px 40px rgba(0,0,0,0.1);
-    }
-    .calendar-header h2 { margin: 0 0 15px; color: #2d3748; }
-    .calendar-nav {
-      display: flex; justify-content: space-between; align-items: center;
-    }
-    .nav-btn {
-      background: #667eea; color: white; padding: 8px 16px; border-radius: 8px;
-      text-decoration: none; font-weight: 600; transition: all 0.3s;
-    }
-    .nav-btn:hover { background: #5a67d8; transform: translateY(-2px); }
-    .week-label { font-weight: 700; font-size: 1.2em; color: #2d3748; }
-    .week-info {
-      text-align: center; margin: 15px 0; color: #4a5568;
-      background: rgba(255,255,255,0.9); padding: 10px; border-radius: 8px;
-    }
-    .week-info a { color: #667eea; text-decoration: none; font-weight: 600; }
-    .legend {
-      display: flex; justify-content: center; gap: 30px; margin: 25px 0;
-      background: rgba(255,255,255,0.9); padding: 20px; border-radius: 12px;
-    }
-    .legend-item { display: flex; align-items: center; gap: 8px; font-weight: 600; }
-    .legend-color {
-      width: 24px; height: 24px; border-radius: 6px; border: 2px solid #e2e8f0;
-    }
-    .legend-available { background: #f0fff4; border-color: #68d391; }
-    .legend-booked { background: #e6fffa; border-color: #4fd1c7; }
-    .legend-unavailable { background: #fed7d7; border-color: #f56565; }
-    .legend-past { background: #f7fafc; border-color: #e2e8f0; }
-    .calendar-grid {
-      display: grid; grid-template-columns: 100px repeat(7, 1fr); gap: 2px;
-      background: #e2e8f0; border-radius: 12px; overflow: hidden; margin: 20px 0;
-    }
-    .time-header, .day-header {
-      background: #667eea; color: white; padding: 15px; text-align: center;
-      font-weight: 700; font-size: 1em;
-    }
-    .time-label {
-      background: #f7fafc; padding: 15px; text-align: center; font-weight: 600;
-      color: #4a5568; display: flex; align-items: center; justify-content: center;
-    }
-    .time-slot {
-      background: white; min-height: 60px; position: relative;
-      border: 2px solid transparent; transition: all 0.3s;
-    }
-    .time-slot.available { background: #f0fff4; border-color: #68d391; }
-    .time-slot.booked { background: #e6fffa; border-color: #4fd1c7; }
-    .time-slot.blocked { background: #fef3c7; border-color: #f59e0b; }
-    .time-slot.unavailable { background: #fed7d7; border-color: #f56565; }
-    .time-slot.past { background: #f7fafc; border-color: #e2e8f0; }
-    .slot-content {
-      padding: 8px; font-size: 0.9em; text-align: center;
-      height: 100%; display: flex; flex-direction: column; justify-content: center;
-    }
-    .booking-label {
-      font-weight: 700; color: #2d3748; margin-bottom: 2px;
-      font-size: 0.85em; line-height: 1.2;
-    }
-    .booking-time {
-      font-size: 0.75em; color: #4a5568; font-weight: 600;
-    }
-    .booking-details {
-      background: white; border-radius: 16px; padding: 30px; margin-top: 30px;
-      box-shadow: 0 10px 40px rgba(0,0,0,0.1);
-    }
-    .booking-details h3 { margin: 0 0 20px; color: #2d3748; }
-    .booking-list { display: grid; gap: 15px; }
-    .booking-item {
-      background: #f8fafc; border: 1px solid #e2e8f0; border-radius: 12px;
-      padding: 20px; transition: all 0.3s; display: flex; justify-content: space-between; align-items: center;
-    }
-    .booking-item:hover { border-color: #667eea; transform: translateY(-2px); }
-    .booking-info { flex: 1; }
-    .booking-item h4 { margin: 0 0 5px; color: #2d3748; }
-    .booking-item .email { margin: 0 0 8px; color: #667eea; font-weight: 600; }
-    .booking-item .time { margin: 0 0 5px; color: #4a5568; font-weight: 600; }
-    .booking-item .calendar-id { margin: 0; color: #718096; font-size: 0.8em; font-family: monospace; }
-    .booking-actions { margin-left: 20px; }
-    .remove-btn {
-      background: #f56565; color: white; border: none; padding: 8px 16px;
-      border-radius: 8px; font-weight: 600; cursor: pointer; transition: all 0.3s;
-      font-size: 0.85em;
-    }
-    .remove-btn:hover { background: #e53e3e; transform: translateY(-2px); }
-    .no-bookings { color: #718096; text-align: center; font-style: italic; margin: 20px 0; }
-    .success-msg {
-      background: linear-gradient(135deg, #c6f6d5 0%, #9ae6b4 100%);
-      color: #22543d; border-radius: 12px; padding: 20px; margin: 25px 0;
-      font-weight: 600; border: 1px solid #68d391;
-    }
-    .slot-form {
-      margin: 0; padding: 0; width: 100%; height: 100%;
-    }
-    .booking-slot-btn {
-      background: none; border: none; padding: 0; margin: 0; width: 100%; height: 100%;
-      cursor: pointer; text-align: center; color: inherit; font-family: inherit;
-      transition: all 0.2s; border-radius: 4px;
-    }
-    .booking-slot-btn:hover {
-      background: rgba(255, 255, 255, 0.2); transform: scale(1.02);
-    }
-    .booking-slot-btn .booking-label {
-      font-weight: 600; font-size: 0.8em; margin-bottom: 2px;
-    }
-    .booking-slot-btn .booking-time {
-      font-size: 0.7em; margin-bottom: 2px;
-    }
-    .booking-slot-btn .remove-indicator {
-      font-size: 0.6em; opacity: 0.7; transition: opacity 0.2s;
-    }
-    .booking-slot-btn:hover .remove-indicator {
-      opacity: 1; font-weight: bold;
-    }
-    .booking-item.info-only {
-      background: linear-gradient(135deg, #f0f9ff 0%, #e0f2fe 100%);
-      border: 1px solid #bae6fd;
-    }
-    .booking-note {
-      margin-left: 20px; display: flex; align-items: center;
-    }
-    .remove-hint {
-      color: #6b7280; font-size: 0.8em; font-style: italic; margin: 0;
-      background: #f3f4f6; padding: 8px 12px; border-radius: 6px;
-    }
-    .block-slot-btn {
-      background: none; border: none; padding: 0; margin: 0; width: 100%; height: 100%;
-      cursor: pointer; text-align: center; color: inherit; font-family: inherit;
-      transition: all 0.2s; border-radius: 4px;
-    }
-    .block-slot-btn:hover {
-      background: rgba(255, 255, 255, 0.3); transform: scale(1.02);
-    }
-    .block-slot-btn .block-label, .block-slot-btn .available-label {
-      font-weight: 600; font-size: 1.2em; margin-bottom: 3px;
-    }
-    .block-slot-btn .block-indicator {
-      font-size: 0.65em; opacity: 0; transition: opacity 0.2s;
-      color: #4a5568; font-weight: 600;
-    }
-    .block-slot-btn:hover .block-indicator {
-      opacity: 1;
-    }
-    .legend-blocked { background: #fef3c7; border-color: #f59e0b; }
-    @media (max-width: 1024px) {
-      .calendar-grid { grid-template-columns: 80px repeat(7, 1fr); }
-      .legend { flex-direction: column; gap: 15px; }
-    }
-    @media (max-width: 768px) {
-      .header { flex-direction: column; gap: 20px; text-align: center; }
-      .calendar-nav { flex-direction: column; gap: 15px; }
-      .calendar-grid { grid-template-columns: 60px repeat(7, 1fr); }
-    }
-    """
+        '''),
+}
+
+# Status -> slot content; statuses without an admin action render as a fixed icon
+_PAST_SLOT = "⏰"
+_SLOT_RENDERERS = {
+    "booked": lambda slot: _SLOT_TEMPLATES["booked"].render(booking=slot.booking) if slot.booking else _PAST_SLOT,
+    "blocked": lambda slot: _SLOT_TEMPLATES["blocked"].render(slot=slot),
+    "available": lambda slot: _SLOT_TEMPLATES["available"].render(slot=slot),
+    "unavailable": lambda slot: "❌",
+    "past": lambda slot: _PAST_SLOT,
+}
+
+def get_slot_content(slot):
+    return _SLOT_RENDERERS[slot.status](slot)
 
 @app.post("/admin/participant")
 @require_auth
 def admin_participant():
     name = request.form["name"].strip()
     email = request.form["email"].strip().lower()
-    token = secrets.token_urlsafe(16)
+    token = new_token()
     with db() as con:
         con.execute("INSERT INTO participants(name,email,token) VALUES(?,?,?)", (name, email, token))
     link = f"{HOST_BASE}/invite/{token}"
@@ -2513,42 +2223,15 @@ def admin_participant():
         email_result = "SCOPE_ERROR: Please re-authenticate with Google and grant Gmail permissions."
 
     # Show detailed receipt page with email status
-    receipt_html = f"""
-    <!doctype html><meta charset="utf-8">
-    <title>Participant Added</title>
-    <style>
-    body{{font-family:system-ui;max-width:600px;margin:40px auto;padding:20px}}
-    .success{{background:#c6f6d5;color:#2f855a;padding:15px;border-radius:10px;margin:20px 0}}
-    .error{{background:#fed7d7;color:#9b2c2c;padding:15px;border-radius:10px;margin:20px 0}}
-    .link{{background:#f7fafc;padding:15px;border-radius:10px;margin:20px 0;word-break:break-all}}
-    </style>
-    <h2>✅ Participant Added</h2>
-    <p><strong>Name:</strong> {name}</p>
-    <p><strong>Email:</strong> {email}</p>
-
-    <div class="link">
-        <strong>Booking Link:</strong><br>
-        <a href='{link}'>{link}</a>
-    </div>
-    """
+    return render_template("receipt.html", name=name, email=email, link=link, email_result=email_result)
 
-    if email_result == "SUCCESS":
-        receipt_html += '<div class="success">📧 Email sent successfully!</div>'
-    elif "NETWORK_ERROR" in email_result:
-        receipt_html += '<div class="error">⚠️ Network issue: Email server unreachable. Participant created successfully - please send the booking link manually.</div>'
-    elif "AUTH_ERROR" in email_result:
-        receipt_html += '<div class="error">🔐 Authentication needed: Please <a href="/logout">sign out</a> and <a href="/google-login">sign in with Google</a> to enable email sending.</div>'
-    elif "SCOPE_ERROR" in email_result:
-        receipt_html += '<div class="error">📧 Permission needed: Please <a href="/logout">sign out</a> and <a href="/google-login">re-authenticate with Google</a> granting Gmail permissions.</div>'
-    elif "EMAIL_SKIPPED" in email_result:
-        receipt_html += '<div class="success">✅ Participant added! Send the booking link manually or copy from console.</div>'
-    elif "DRY-RUN" in email_result:
-        receipt_html += '<div class="error">⚠️ No SMTP configured - email not sent. Please configure SMTP settings in .env file.</div>'
-    else:
-        receipt_html += f'<div class="error">❌ Email failed: {email_result}</div>'
+# Fixed fragments of the batch results cards, shared by every card
+_BATCH_ITEM_SUCCESS = '<div class="participant-item success">'
+_BATCH_ITEM_FAILED = '<div class="participant-item failed">'
+_BATCH_BADGE_SUCCESS = '<span class="status-badge status-success">✅ Email Sent</span>'
 
-    receipt_html += '<p><a href="/admin">← Back to Admin</a></p>'
-    return receipt_html
+def _batch_failure_badge(email_result):
+    return f'<span class="status-badge status-failed">❌ {escape(email_result)}</span>'
 
 @app.post("/admin/participants/batch")
 @require_auth
@@ -2561,7 +2244,8 @@ def admin_participants_batch():
 
     # Clean and validate data
     participants_data = []
-    for i, (name, email) in enumerate(zip(names, emails)):
+    tokens = generate_tokens(len(names))
+    for i, (name, email, token) in enumerate(zip(names, emails, tokens)):
         name = name.strip()
         email = email.strip().lower()
 
@@ -2571,72 +2255,71 @@ def admin_participants_batch():
         participants_data.append({
             'name': name,
             'email': email,
-            'token': secrets.token_urlsafe(16)
+            'token': token
         })
 
-    # Create all participants in database
+    # Create all participants in database (one statement, one transaction)
     with db() as con:
-        for p in participants_data:
-            con.execute("INSERT INTO participants(name,email,token) VALUES(?,?,?)",
-                       (p['name'], p['email'], p['token']))
+        con.executemany("INSERT INTO participants(name,email,token) VALUES(?,?,?)",
+                        [(p['name'], p['email'], p['token']) for p in participants_data])
 
-    # Generate links and send emails
-    email_results = []
-    successful_participants = []
-    failed_participants = []
+    total_count = len(participants_data)
 
-    for p in participants_data:
+    def send_invite(p):
         link = f"{HOST_BASE}/invite/{p['token']}"
         print(f"[BATCH PARTICIPANT] Processing {p['name']} ({p['email']})")
+        return link, send_initial_email(p['email'], p['name'], link)
 
-        # Send email
-        email_result = send_initial_email(p['email'], p['name'], link)
-        email_results.append({
-            'name': p['name'],
-            'email': p['email'],
-            'link': link,
-            'result': email_result
-        })
-
-        if email_result == "SUCCESS":
-            successful_participants.append(p)
-        else:
-            failed_participants.append(p)
-
-    # Generate batch results page
-    total_count = len(participants_data)
-    success_count = len(successful_participants)
-    failed_count = len(failed_participants)
+    receipt_css_url = asset_url('receipt.css')
 
-    results_html = f"""
+    def generate_results_page():
+        yield f"""
     <!doctype html><meta charset="utf-8">
     <title>Batch Participants Added</title>
-    <style>
-    body{{font-family:system-ui;max-width:800px;margin:40px auto;padding:20px;background:#f8fafc}}
-    .header{{background:linear-gradient(135deg,#667eea 0%,#764ba2 100%);color:white;padding:30px;border-radius:16px;margin-bottom:30px;text-align:center}}
-    .stats{{display:grid;grid-template-columns:repeat(3,1fr);gap:20px;margin:30px 0}}
-    .stat-card{{background:white;padding:20px;border-radius:12px;text-align:center;border:2px solid #e2e8f0}}
-    .stat-card.success{{border-color:#68d391;background:linear-gradient(135deg,#f0fff4 0%,#c6f6d5 100%)}}
-    .stat-card.error{{border-color:#fc8181;background:linear-gradient(135deg,#fff5f5 0%,#fed7d7 100%)}}
-    .stat-number{{font-size:3em;font-weight:700;margin:10px 0}}
-    .participant-grid{{display:grid;gap:15px;margin:20px 0}}
-    .participant-item{{background:white;border-radius:12px;padding:20px;border:2px solid #e2e8f0;transition:all 0.3s}}
-    .participant-item.success{{border-color:#68d391;background:linear-gradient(135deg,#f0fff4 0%,#e6fffa 100%)}}
-    .participant-item.failed{{border-color:#fc8181;background:linear-gradient(135deg,#fff5f5 0%,#fed7d7 100%)}}
-    .participant-item:hover{{transform:translateY(-2px);box-shadow:0 10px 25px rgba(0,0,0,0.1)}}
-    .status-badge{{display:inline-block;padding:4px 12px;border-radius:20px;font-size:0.8em;font-weight:600;margin-left:10px}}
-    .status-success{{background:#c6f6d5;color:#22543d}}
-    .status-failed{{background:#fed7d7;color:#9b2c2c}}
-    .link-box{{background:#f8fafc;padding:10px;border-radius:8px;margin-top:10px;font-size:0.9em;word-break:break-all}}
-    .back-btn{{background:linear-gradient(135deg,#667eea 0%,#764ba2 100%);color:white;padding:15px 30px;border-radius:12px;text-decoration:none;font-weight:600;display:inline-block;margin:30px 0;transition:all 0.3s}}
-    .back-btn:hover{{transform:translateY(-2px);box-shadow:0 15px 30px rgba(102,126,234,0.4)}}
-    </style>
+    <link rel="stylesheet" href="{receipt_css_url}">
+    <body class="batch">
 
     <div class="header">
         <h1>📤 Batch Participants Created</h1>
-        <p>Processing completed for {total_count} participant(s)</p>
+        <p>Sending emails to {total_count} participant(s)...</p>
+    </div>
+
+    <h2>📋 Detailed Results</h2>
+    <div class="participant-grid">
+    """
+
+        # Emails are network-bound, so send them concurrently and stream each
+        # card as soon as its email finishes
+        success_count = 0
+        futures = {_email_pool.submit(send_invite, p): p for p in participants_data}
+        for future in as_completed(futures):
+            p = futures[future]
+            link, email_result = future.result()
+            if email_result == "SUCCESS":
+                success_count += 1
+                item_open, badge = _BATCH_ITEM_SUCCESS, _BATCH_BADGE_SUCCESS
+            else:
+                item_open, badge = _BATCH_ITEM_FAILED, _batch_failure_badge(email_result)
+
+            yield f"""
+        {item_open}
+            <div style="display:flex;justify-content:space-between;align-items:center;margin-bottom:10px">
+                <h4 style="margin:0">{escape(p['name'])}</h4>
+                {badge}
+            </div>
+            <p style="margin:5px 0;color:#667eea;font-weight:600">{escape(p['email'])}</p>
+            <div class="link-box">
+                <strong>Booking Link:</strong><br>
+                <a href="{link}" target="_blank">{link}</a>
+            </div>
+        </div>
+        """
+
+        failed_count = total_count - success_count
+        yield f"""
     </div>
 
+    <h2>📊 Summary</h2>
     <div class="stats">
         <div class="stat-card success">
             <div class="stat-number">{success_count}</div>
@@ -2655,38 +2338,12 @@ def admin_participants_batch():
         </div>
     </div>
 
-    <h2>📋 Detailed Results</h2>
-    <div class="participant-grid">
-    """
-
-    for result in email_results:
-        status_class = "success" if result['result'] == "SUCCESS" else "failed"
-        status_text = "✅ Email Sent" if result['result'] == "SUCCESS" else f"❌ {result['result']}"
-        status_badge_class = "status-success" if result['result'] == "SUCCESS" else "status-failed"
-
-        results_html += f"""
-        <div class="participant-item {status_class}">
-            <div style="display:flex;justify-content:space-between;align-items:center;margin-bottom:10px">
-                <h4 style="margin:0">{result['name']}</h4>
-                <span class="status-badge {status_badge_class}">{status_text}</span>
-            </div>
-            <p style="margin:5px 0;color:#667eea;font-weight:600">{result['email']}</p>
-            <div class="link-box">
-                <strong>Booking Link:</strong><br>
-                <a href="{result['link']}" target="_blank">{result['link']}</a>
-            </div>
-        </div>
-        """
-
-    results_html += f"""
-    </div>
-
     <div style="text-align:center">
         <a href="/admin" class="back-btn">← Back to Admin Dashboard</a>
     </div>
     """
 
-    return results_html
+    return Response(stream_with_context(generate_results_page()), mimetype="text/html")
 
 @app.post("/admin/direct-booking")
 @require_auth
@@ -2710,7 +2367,7 @@ def admin_direct_booking():
             return redirect(url_for("admin") + "?msg=invalid_time_range")
 
         # Create participant and booking
-        token = secrets.token_urlsafe(16)
+        token = new_token()
         with db() as con:
             # Create participant
             con.execute("INSERT INTO participants(name,email,token) VALUES(?,?,?)", (name, email, token))
@@ -2744,7 +2401,8 @@ def admin_direct_booking():
             created = svc.events().insert(
                 calendarId=calendar_id_to_use,
                 body=event,
-                sendUpdates="all"
+                sendUpdates="all",
+                fields="id",  # only the event id is used
             ).execute()
             print(f"[DIRECT BOOKING] Calendar event created: {created.get('id')}")
         except Exception as calendar_error:
@@ -2753,7 +2411,8 @@ def admin_direct_booking():
                 created = svc.events().insert(
                     calendarId="primary",
                     body=event,
-                    sendUpdates="all"
+                    sendUpdates="all",
+                    fields="id",  # only the event id is used
                 ).execute()
                 print(f"[DIRECT BOOKING] Calendar event created on primary: {created.get('id')}")
             else:
@@ -2764,10 +2423,14 @@ def admin_direct_booking():
             con.execute("""
                 UPDATE bookings SET calendar_event_id = ? WHERE id = ?
             """, (created['id'], booking_id))
+        invalidate_busy_cache()
 
         print(f"[DIRECT BOOKING] Successfully booked {name} ({email}) for {start_dt} - {end_dt}")
         return redirect(url_for("admin") + "?msg=direct_booking_success")
 
+    except sqlite3.IntegrityError as e:
+        print(f"[DIRECT BOOKING] Slot already confirmed for another participant: {e}")
+        return redirect(url_for("admin") + "?msg=slot_taken")
     except Exception as e:
         import traceback
         print(f"[DIRECT BOOKING ERROR] {e}")
@@ -2788,6 +2451,7 @@ def admin_block_slot():
     with db() as con:
         con.execute("INSERT INTO blocked_slots(start_time, end_time) VALUES(?,?)",
                    (start_time, end_time))
+    invalidate_invite_grids()
 
     return redirect(url_for("admin_calendar", week=week) + "?msg=slot_blocked")
 
@@ -2805,6 +2469,7 @@ def admin_unblock_slot():
     with db() as con:
         con.execute("DELETE FROM blocked_slots WHERE start_time=? AND end_time=?",
                    (start_time, end_time))
+    invalidate_invite_grids()
 
     return redirect(url_for("admin_calendar", week=week) + "?msg=slot_unblocked")
 
@@ -2813,349 +2478,155 @@ def admin_unblock_slot():
 # ──────────────────────────────────────────────────────────────────────────────
 @app.get("/uploads/<filename>")
 def uploaded_file(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    # Upload names carry a random token and are never rewritten, so clients can
+    # revalidate with the ETag / cache them for an hour
+    return send_from_directory(app.config['UPLOAD_FOLDER'], filename,
+                               conditional=True, etag=True, max_age=3600)
 
-@app.get("/consent")
-def consent():
-    html = get_setting("consent_html")
-    files = get_consent_files()
+# The first /consent page only changes when the admin saves the consent HTML or
+# uploads a file, so it is rendered once and kept until then
+_consent_page = {}
 
-    consent_content = f"<!doctype html><meta charset='utf-8'><title>Consent Form</title>"
-    consent_content += "<style>body{font-family:system-ui;max-width:800px;margin:40px auto;padding:20px;line-height:1.6}</style>"
+def invalidate_consent_page():
+    _consent_page.pop("body", None)
 
-    if html:
-        consent_content += html
-
-    if files:
-        consent_content += "<h3>📄 Consent Documents</h3>"
-        for file in files:
-            consent_content += f"<p><a href='/uploads/{file['filename']}' target='_blank'>📎 {file['original_name']}</a></p>"
-
-    if not html and not files:
-        consent_content += "<h2>Consent Form</h2><p>No consent form has been uploaded yet.</p>"
-
-    return consent_content
+@app.get("/consent")
+def consent():
+    before = request.args.get("before", type=int)
+    if before is None:
+        page = _consent_page.get("body")
+        if page is not None:
+            return page
+    page = render_template("consent.html", html=get_setting("consent_html"),
+                           files=get_consent_files(before=before), page_size=CONSENT_FILES_PAGE)
+    if before is None:
+        _consent_page["body"] = page
+    return page
 
 # ──────────────────────────────────────────────────────────────────────────────
-# Invite + booking flow
+# Invite + booking flow (page markup lives in templates/invite.html and
+# templates/booking_submitted.html)
 # ──────────────────────────────────────────────────────────────────────────────
-INVITE_HTML = """
-<!doctype html><meta charset="utf-8">
-<title>{{title}}</title>
-<meta name="viewport" content="width=device-width, initial-scale=1">
-<style>
- * { box-sizing: border-box; }
- body {
-   font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, system-ui, sans-serif;
-   max-width: 1200px; margin: 0 auto; padding: 20px;
-   background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-   min-height: 100vh;
- }
- .container {
-   background: white; border-radius: 16px; padding: 40px;
-   box-shadow: 0 20px 40px rgba(0,0,0,0.1);
- }
- h2 {
-   margin: 0 0 20px; color: #2d3748; font-size: 2.2em;
-   background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-   -webkit-background-clip: text; -webkit-text-fill-color: transparent;
- }
- .welcome {
-   background: #f7fafc; border-radius: 12px; padding: 20px; margin-bottom: 30px;
-   border-left: 4px solid #667eea;
- }
- .consent-link {
-   background: #fff5f5; border: 1px solid #fed7d7; border-radius: 10px;
-   padding: 15px; margin: 20px 0; text-align: center;
- }
- .consent-link a {
-   color: #e53e3e; font-weight: 600; text-decoration: none;
- }
- .error {
-   background: #fed7d7; color: #9b2c2c; border-radius: 10px;
-   padding: 15px; margin: 20px 0; font-weight: 600;
- }
- .calendar-container {
-   background: #f8fafc; border-radius: 12px; padding: 20px; margin: 20px 0;
- }
- .calendar-header {
-   display: flex; justify-content: space-between; align-items: center;
-   margin-bottom: 20px; padding-bottom: 15px; border-bottom: 2px solid #e2e8f0;
- }
- .calendar-nav {
-   display: flex; gap: 10px; align-items: center;
- }
- .nav-btn {
-   background: #667eea; color: white; border: none; padding: 8px 12px;
-   border-radius: 6px; cursor: pointer; font-weight: 600; transition: all 0.2s;
- }
- .nav-btn:hover {
-   background: #5a67d8; transform: translateY(-1px);
- }
- .calendar-grid {
-   display: grid; grid-template-columns: 80px repeat(7, 1fr); gap: 1px;
-   background: #e2e8f0; border-radius: 8px; overflow: hidden;
- }
- .time-header {
-   background: #4a5568; color: white; padding: 12px 8px; text-align: center;
-   font-weight: 600; font-size: 0.9em;
- }
- .day-header {
-   background: #667eea; color: white; padding: 12px; text-align: center;
-   font-weight: 600; font-size: 0.95em;
- }
- .time-label {
-   background: #edf2f7; padding: 8px; text-align: center; font-size: 0.8em;
-   font-weight: 600; color: #4a5568; display: flex; align-items: center; justify-content: center;
- }
- .time-slot {
-   background: white; min-height: 50px; display: flex; align-items: center;
-   justify-content: center; cursor: pointer; transition: all 0.2s;
-   border: 2px solid transparent; position: relative;
- }
- .time-slot.available {
-   background: #f0fff4; border-color: #68d391;
- }
- .time-slot.available:hover {
-   background: #c6f6d5; border-color: #48bb78; transform: scale(0.98);
- }
- .time-slot.unavailable {
-   background: #fed7d7; color: #9b2c2c; cursor: not-allowed;
- }
- .time-slot.past {
-   background: #f7fafc; color: #a0aec0; cursor: not-allowed;
- }
- .time-slot.selected {
-   background: #bee3f8; border-color: #3182ce; border-width: 3px;
- }
- .time-slot.selected:hover {
-   background: #90cdf4; border-color: #2c5282;
- }
- .slot-status {
-   font-size: 0.8em; font-weight: 600; text-align: center;
- }
- .available .slot-status {
-   color: #2f855a;
- }
- .unavailable .slot-status {
-   color: #9b2c2c;
- }
- .past .slot-status {
-   color: #a0aec0;
- }
- .legend {
-   display: flex; justify-content: center; gap: 30px; margin: 20px 0;
-   padding: 15px; background: #edf2f7; border-radius: 8px;
- }
- .legend-item {
-   display: flex; align-items: center; gap: 8px; font-size: 0.9em;
- }
- .legend-color {
-   width: 20px; height: 20px; border-radius: 4px; border: 2px solid #e2e8f0;
- }
- .legend-available { background: #f0fff4; border-color: #68d391; }
- .legend-unavailable { background: #fed7d7; border-color: #f56565; }
- .legend-past { background: #f7fafc; border-color: #e2e8f0; }
- .timezone-info {
-   background: #edf2f7; border-radius: 8px; padding: 10px; margin: 15px 0;
-   color: #4a5568; font-size: 0.9em; text-align: center;
- }
- @media (max-width: 768px) {
-   body { padding: 10px; }
-   .container { padding: 20px; }
-   .calendar-grid { grid-template-columns: 60px repeat(7, 1fr); }
-   .legend { flex-direction: column; gap: 10px; }
- }
-</style>
-<body>
-<div class="container">
-<h2>📅 {{title}}</h2>
-
-<div class="welcome">
-  <p>👋 Hi <strong>{{name}}</strong>! Select up to <strong>3 preferred time slots</strong> from the calendar below. The admin will pick one for you.</p>
-  <div class="timezone-info">
-    🌍 All times shown in <strong>Toronto Time (EST/EDT)</strong>
-  </div>
-  <div id="selection-status" style="background: #e6fffa; padding: 10px; border-radius: 8px; margin: 10px 0; text-align: center; color: #234e52;">
-    <strong>Selected slots: <span id="slot-count">0</span>/3</strong>
-    <div id="selected-times"></div>
-  </div>
-</div>
-
-<div class="consent-link">
-  📋 <strong>Important:</strong> Please review the <a href="/consent" target="_blank">consent form</a> before booking
-</div>
-
-{% if error %}
-<div class="error">⚠️ {{error}}</div>
-{% endif %}
-
-<div class="calendar-container">
-  <div class="calendar-header">
-    <h3 style="margin: 0; color: #2d3748;">📅 Available Time Slots</h3>
-    <div class="calendar-nav">
-      {% if prev_week_url %}
-      <a href="{{prev_week_url}}" class="nav-btn" style="text-decoration: none;">⬅️ Previous Week</a>
-      {% else %}
-      <div style="width: 120px;"></div>
-      {% endif %}
-      <span style="color: #4a5568; font-weight: 600; margin: 0 20px;">{{current_week_label}}</span>
-      {% if next_week_url %}
-      <a href="{{next_week_url}}" class="nav-btn" style="text-decoration: none;">Next Week ➡️</a>
-      {% else %}
-      <div style="width: 120px;"></div>
-      {% endif %}
-    </div>
-  </div>
-
-  <div style="text-align: center; margin: 15px 0; color: #718096;">
-    {% if week_offset == 0 %}
-    <strong>This Week</strong> •
-    {% else %}
-    <strong>Week {{week_offset + 1}}</strong> •
-    {% endif %}
-    Showing up to 8 weeks of availability •
-    <a href="/invite/{{request.view_args.token}}" style="color: #667eea; text-decoration: none;">📅 Current Week</a>
-  </div>
-
-  <div class="legend">
-    <div class="legend-item">
-      <div class="legend-color legend-available"></div>
-      <span>✅ Available</span>
-    </div>
-    <div class="legend-item">
-      <div class="legend-color legend-unavailable"></div>
-      <span>❌ Unavailable</span>
-    </div>
-    <div class="legend-item">
-      <div class="legend-color legend-past"></div>
-      <span>⏰ Past</span>
-    </div>
-  </div>
-
-  <div class="calendar-grid">
-    <div class="time-header">Time</div>
-    {% for day in calendar_days %}
-    <div class="day-header">{{day.header}}</div>
-    {% endfor %}
-
-    {% for hour in range(9, 25) %}
-    <div class="time-label">{{hour}}:00</div>
-    {% for day in calendar_days %}
-    {% set slot = day.slots[hour-9] %}
-    <div class="time-slot {{slot.status}}"
-         {% if slot.status == 'available' %}onclick="toggleSlot('{{slot.start}}', '{{slot.end}}', this)"{% endif %}
-         data-start="{{slot.start}}" data-end="{{slot.end}}">
-      <div class="slot-status">
-        {% if slot.status == 'available' %}✅{% elif slot.status == 'unavailable' %}❌{% else %}⏰{% endif %}
-      </div>
-    </div>
-    {% endfor %}
-    {% endfor %}
-  </div>
-</div>
-
-<div style="text-align: center; margin-top: 30px; color: #4a5568;">
-  💡 <strong>Tip:</strong> Click on green ✅ slots to select (up to 3). Blue = selected. Click again to deselect.
-</div>
-
-<div style="text-align: center; margin: 30px 0;">
-  <button id="submit-btn" onclick="submitBooking()"
-          style="background: #667eea; color: white; border: none; padding: 15px 30px;
-                 border-radius: 8px; font-size: 1.1em; font-weight: 600; cursor: pointer;
-                 opacity: 0.5; transition: all 0.3s;" disabled>
-    📅 Submit Time Preferences
-  </button>
-  <div style="margin-top: 10px; font-size: 0.9em; color: #666;">
-    Select at least 1 time slot to continue
-  </div>
-</div>
-
-</div>
-
-<script>
-let selectedSlots = [];
-const maxSlots = 3;
-
-function toggleSlot(start, end, element) {
-  const slotKey = start + '|' + end;
-  const index = selectedSlots.findIndex(slot => slot.key === slotKey);
-
-  if (index >= 0) {
-    // Deselect
-    selectedSlots.splice(index, 1);
-    element.classList.remove('selected');
-  } else {
-    // Select (if under limit)
-    if (selectedSlots.length >= maxSlots) {
-      alert('You can only select up to 3 time slots');
-      return;
-    }
-    selectedSlots.push({key: slotKey, start: start, end: end, element: element});
-    element.classList.add('selected');
-  }
-
-  updateDisplay();
-}
-
-function updateDisplay() {
-  const count = selectedSlots.length;
-  document.getElementById('slot-count').textContent = count;
-
-  const timesDiv = document.getElementById('selected-times');
-  if (count === 0) {
-    timesDiv.innerHTML = '';
-  } else {
-    const timeStrings = selectedSlots.map((slot, i) => {
-      const startDate = new Date(slot.start);
-      const endDate = new Date(slot.end);
-      const timeStr = startDate.toLocaleDateString('en-US', {weekday: 'short', month: 'short', day: 'numeric'}) +
-                     ' ' + startDate.toLocaleTimeString('en-US', {hour: 'numeric', minute: '2-digit'}) +
-                     '-' + endDate.toLocaleTimeString('en-US', {hour: 'numeric', minute: '2-digit'});
-      return `<div style="margin: 5px 0; padding: 5px; background: white; border-radius: 4px;">
-                <strong>Choice ${i+1}:</strong> ${timeStr}
-              </div>`;
-    });
-    timesDiv.innerHTML = timeStrings.join('');
-  }
-
-  const submitBtn = document.getElementById('submit-btn');
-  if (count > 0) {
-    submitBtn.disabled = false;
-    submitBtn.style.opacity = '1';
-    submitBtn.querySelector('div').textContent = `Submit ${count} time preference${count > 1 ? 's' : ''}`;
-  } else {
-    submitBtn.disabled = true;
-    submitBtn.style.opacity = '0.5';
-  }
-}
-
-function submitBooking() {
-  if (selectedSlots.length === 0) {
-    alert('Please select at least one time slot');
-    return;
-  }
-
-  const token = window.location.pathname.split('/').pop();
-  let url = `/book?token=${token}`;
-
-  selectedSlots.forEach((slot, i) => {
-    url += `&start${i+1}=${encodeURIComponent(slot.start)}&end${i+1}=${encodeURIComponent(slot.end)}`;
-  });
-
-  console.log('Submitting booking with URL:', url);
-  window.location.href = url;
-}
-</script>
+def invite_week_window(day):
+    """Monday 00:00 to the following Monday 01:00 in TZ for the week containing day (its last slot starts at midnight after Sunday)"""
+    monday = day - timedelta(days=day.weekday())
+    week_start = datetime(monday.year, monday.month, monday.day, tzinfo=TZ)
+    return week_start, week_start + timedelta(days=7, hours=1)
+
+# Participants are never renamed or deleted, so a token's row can be reused
+_PARTICIPANTS_BY_TOKEN = {}
+PARTICIPANT_CACHE_MAX = 4096
+
+def get_participant_by_token(token):
+    p = _PARTICIPANTS_BY_TOKEN.get(token)
+    if p is None:
+        with db() as con:
+            p = con.execute("SELECT id, name FROM participants WHERE token=?", (token,)).fetchone()
+        if p:
+            if len(_PARTICIPANTS_BY_TOKEN) >= PARTICIPANT_CACHE_MAX:
+                _PARTICIPANTS_BY_TOKEN.clear()
+            _PARTICIPANTS_BY_TOKEN[token] = p
+    return p
+
+_INVITE_SLOT_ICONS = {"available": "✅", "unavailable": "❌", "past": "⏰"}
+
+@lru_cache(maxsize=128)
+def _week_skeleton(monday):
+    """Day headers and hour rows of (start_iso, end_iso, start_epoch, end_epoch) for the week starting at monday"""
+    week_start = datetime(monday.year, monday.month, monday.day, tzinfo=TZ)
+    days = [week_start + timedelta(days=d) for d in range(7)]
+    day_headers = tuple(day_header(day.date()) for day in days)
+    # One row per hour (9 AM to 12 AM), one slot per day
+    hour_rows = zip(*(slot_range_for_day(day) for day in days))
+    rows = tuple(
+        (f"{hour}:00", tuple((start.isoformat(), end.isoformat(), int(start.timestamp()), int(end.timestamp()))
+                             for start, end in slots))
+        for hour, slots in zip(range(9, 25), hour_rows))
+    return day_headers, rows
+
+# Rendered invite grids, shared by every participant viewing the same week
+# within the same hour (slots start on the hour, so "past" can't change sooner)
+INVITE_GRID_TTL = 60
+INVITE_MAX_AGE = 30
+_invite_grid_cache = {}
+_invite_grid_lock = threading.Lock()
+
+def invalidate_invite_grids():
+    """Drop rendered invite grids; call after calendar events or blocked slots change (pending requests don't count)"""
+    with _invite_grid_lock:
+        _invite_grid_cache.clear()
+
+class InviteGrid:
+    """Slot grid for one invite page. It is built on first use, so a streamed
+    page can send its head before the FreeBusy lookup returns."""
+
+    def __init__(self, week_start, week_end, now_local):
+        self.week_start = week_start
+        self.week_end = week_end
+        self.now_local = now_local
+
+    calendar_available = property(lambda self: self._built[0])
+    html = property(lambda self: self._built[1])
+    version = property(lambda self: self._built[2])
+
+    @cached_property
+    def _built(self):
+        key = (self.week_start.isoformat(), int(self.now_local.timestamp()) // 3600)
+        now = time.monotonic()
+        with _invite_grid_lock:
+            hit = _invite_grid_cache.get(key)
+        if hit and hit[0] > now:
+            return hit[1]
+        built = self._build()
+        if built[0]:  # don't hold on to an all-unavailable grid while Google is unreachable
+            with _invite_grid_lock:
+                for k in [k for k, (expires, _) in _invite_grid_cache.items() if expires <= now]:
+                    del _invite_grid_cache[k]
+                _invite_grid_cache[key] = (now + INVITE_GRID_TTL, built)
+        return built
+
+    def _build(self):
+        # Fetch the week's busy intervals and blocked slots once, then check slots in memory
+        busy_intervals = BusyIntervals((), ())
+        try:
+            service = calendar_service()
+            busy_intervals = get_busy_intervals(service, self.week_start, self.week_end)
+            calendar_available = True
+        except Exception as e:
+            print(f"[CALENDAR ERROR] Calendar service unavailable: {e}")
+            calendar_available = False
+        # Without the calendar every future slot is unavailable, so blocks don't matter
+        blocked_slots = get_blocked_slot_keys(self.week_start, self.week_end) if calendar_available else frozenset()
+
+        # Overlay each slot's status on the (cached) week skeleton and emit the
+        # grid markup directly; every value is a fixed status/icon or an ISO time
+        day_headers, skeleton_rows = _week_skeleton(self.week_start.date())
+        now_ts = self.now_local.timestamp()
+        parts = ['<div class="time-header">Time</div>']
+        parts += [f'<div class="day-header">{header}</div>' for header in day_headers]
+        for hour_label, slots in skeleton_rows:
+            parts.append(f'<div class="time-label">{hour_label}</div>')
+            for start_iso, end_iso, start_ts, end_ts in slots:
+                if start_ts <= now_ts:
+                    status = "past"
+                elif not calendar_available:
+                    # If calendar is not connected, show all future slots as unavailable
+                    status = "unavailable"
+                elif (start_iso, end_iso) in blocked_slots or overlaps_busy(busy_intervals, start_ts, end_ts):
+                    status = "unavailable"
+                else:
+                    status = "available"
 
-</body>
-"""
+                if status == "available":
+                    parts.append(f'''<div class="time-slot available" onclick="toggleSlot('{start_iso}', '{end_iso}', this)" data-start="{start_iso}" data-end="{end_iso}"><div class="slot-status">✅</div></div>''')
+                else:
+                    parts.append(f'''<div class="time-slot {status}" data-start="{start_iso}" data-end="{end_iso}"><div class="slot-status">{_INVITE_SLOT_ICONS[status]}</div></div>''')
+        return calendar_available, Markup("".join(parts)), availability_version(busy_intervals)
 
 @app.get("/invite/<token>")
 def invite(token):
     # lookup participant
-    with db() as con:
-        p = con.execute("SELECT * FROM participants WHERE token=?", (token,)).fetchone()
+    p = get_participant_by_token(token)
     if not p:
         abort(404)
 
@@ -3166,73 +2637,10 @@ def invite(token):
     elif week_offset > 8:  # Limit to 8 weeks out
         week_offset = 8
 
-    # Calculate the start date for the requested week
-    today_local = datetime.now(TZ).replace(hour=0, minute=0, second=0, microsecond=0)
-    # Get to the start of the week (Monday)
-    week_start = today_local + timedelta(days=week_offset * 7)
-    # Adjust to show Monday to Sunday
-    days_from_monday = week_start.weekday()  # 0=Monday, 6=Sunday
-    week_start = week_start - timedelta(days=days_from_monday)
-
     now_local = datetime.now(TZ)
+    week_start, week_end = invite_week_window((now_local + timedelta(days=week_offset * 7)).date())
 
-    # Check if calendar service is available
-    try:
-        service = calendar_service()
-        calendar_available = True
-    except Exception as e:
-        print(f"[CALENDAR ERROR] Calendar service unavailable: {e}")
-        service = None
-        calendar_available = False
-
-    # Generate 7 days of calendar data (Monday to Sunday)
-    calendar_days = []
-    for d in range(7):
-        day = week_start + timedelta(days=d)
-        day_header = day.strftime("%a %m/%d").replace(" 0", " ")
-
-        # Generate hour slots for this day (9 AM to 12 AM = 16 slots)
-        day_slots = []
-        for hour in range(9, 25):  # 9 AM to 12 AM
-            if hour == 24:
-                # Handle midnight as hour 0 of next day
-                start = (day + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=TZ)
-            else:
-                start = day.replace(hour=hour, minute=0, second=0, microsecond=0, tzinfo=TZ)
-            end = start + timedelta(hours=1)
-
-            # Determine slot status
-            if start <= now_local:
-                status = "past"
-                url = ""
-            elif not calendar_available:
-                # If calendar is not connected, show all future slots as unavailable
-                status = "unavailable"
-                url = ""
-            elif is_free(service, start, end):
-                status = "available"
-                q = {"token": token, "start": start.isoformat(), "end": end.isoformat()}
-                url = f"{url_for('book')}?{urlencode(q)}"
-            else:
-                status = "unavailable"
-                url = ""
-
-            day_slots.append({
-                "status": status,
-                "url": url,
-                "start": start.isoformat(),
-                "end": end.isoformat()
-            })
-
-        calendar_days.append({
-            "header": day_header,
-            "slots": day_slots
-        })
-
-    # Generate week label
-    start_date = week_start.strftime("%b %d").replace(" 0", " ")
-    end_date = (week_start + timedelta(days=6)).strftime("%b %d").replace(" 0", " ")
-    current_week_label = f"{start_date} - {end_date}"
+    current_week_label = week_label(week_start.date())
 
     # Generate navigation URLs
     prev_week_url = None
@@ -3241,22 +2649,23 @@ def invite(token):
     if week_offset > 0:
         prev_week_url = url_for('invite', token=token, week=week_offset-1) if week_offset > 1 else url_for('invite', token=token)
 
-    # Add error message if calendar is not available
-    error_msg = request.args.get("error")
-    if not calendar_available and not error_msg:
-        error_msg = "Calendar system is not connected. All slots are currently unavailable. Please contact the administrator."
-
-    return render_template_string(
-        INVITE_HTML,
+    # Stream the page: the head and stylesheet go out right away and the grid
+    # (which waits on FreeBusy) is built when the template reaches it
+    response = Response(stream_template(
+        "invite.html",
         title=APP_TITLE,
         name=p["name"],
-        calendar_days=calendar_days,
+        grid=InviteGrid(week_start, week_end, now_local),
         current_week_label=current_week_label,
         prev_week_url=prev_week_url,
         next_week_url=next_week_url,
         week_offset=week_offset,
-        error=error_msg
-    )
+        error=request.args.get("error")
+    ), mimetype="text/html")
+    # Let a refresh reuse the page briefly; /book re-checks every pick anyway
+    response.cache_control.private = True
+    response.cache_control.max_age = INVITE_MAX_AGE
+    return response
 
 @app.get("/book")
 def book():
@@ -3272,103 +2681,84 @@ def book():
     if not (token and slots):
         abort(400)
 
-    with db() as con:
-        p = con.execute("SELECT * FROM participants WHERE token=?", (token,)).fetchone()
+    p = get_participant_by_token(token)
     if not p:
         abort(404)
 
     # Validate each time slot
     validated_slots = []
     svc = calendar_service()
-    nowl = datetime.now(TZ)
+    now_ts = time.time()
 
     for start_s, end_s in slots:
-        start = datetime.fromisoformat(start_s)
-        end   = datetime.fromisoformat(end_s)
+        try:
+            start = parse_slot_iso(start_s)
+            end   = parse_slot_iso(end_s)
+        except ValueError:
+            abort(400)
 
-        # enforce business rules
+        # The invite page only hands out offset-qualified ISO times
         if start.tzinfo is None or end.tzinfo is None:
-            start = start.replace(tzinfo=TZ); end = end.replace(tzinfo=TZ)
+            abort(400)
+        # enforce business rules
         if end - start != timedelta(hours=1):
             return redirect(url_for("invite", token=token, error="Invalid slot length."))
-        if start <= nowl:
+        if start.timestamp() <= now_ts:
             return redirect(url_for("invite", token=token, error="That time is in the past."))
         if not (start.hour >= 9 and end.hour <= 25):
             return redirect(url_for("invite", token=token, error="Outside bookable hours."))
 
-        # check availability
-        if not is_free(svc, start, end):
-            return redirect(url_for("invite", token=token, error=f"Sorry, one of your selected slots was just taken."))
-
         validated_slots.append((start, end))
 
-    # Store booking request with multiple preferences
+    # Check all preferences against one FreeBusy lookup. Slots picked on one
+    # invite page share its week window, so this normally reuses that page's
+    # cached result; blocked slots are re-checked when the request is stored.
+    windows = {invite_week_window((start.astimezone(TZ) - timedelta(hours=1)).date()) for start, _ in validated_slots}
+    if len(windows) == 1:
+        window_start, window_end = windows.pop()
+    else:
+        window_start = min(start for start, _ in validated_slots)
+        window_end = max(end for _, end in validated_slots)
+    busy_intervals = get_busy_intervals(svc, window_start, window_end)
+    seen_version = request.args.get("v")
+    if seen_version and seen_version != availability_version(busy_intervals):
+        # The participant picked from a different view of the calendar than the
+        # cached one, so confirm the picks against Google directly
+        busy_intervals = get_busy_intervals(svc, window_start, window_end, refresh=True)
+    for start, end in validated_slots:
+        if overlaps_busy(busy_intervals, start.timestamp(), end.timestamp()):
+            return redirect(url_for("invite", token=token, error="Sorry, one of your selected slots was just taken."))
+
+    # Store booking request with multiple preferences (unused preferences stay NULL)
+    params = [p['id']]
+    for start, end in validated_slots:
+        params += [start.isoformat(), end.isoformat()]
+    params += [None] * (7 - len(params))
     with db() as con:
-        # Build dynamic SQL based on number of slots provided
-        if len(validated_slots) == 1:
-            con.execute("""
-                INSERT INTO bookings (participant_id, preference1_start, preference1_end, status)
-                VALUES (?, ?, ?, 'pending')
-            """, (p['id'], validated_slots[0][0].isoformat(), validated_slots[0][1].isoformat()))
-        elif len(validated_slots) == 2:
-            con.execute("""
-                INSERT INTO bookings (participant_id, preference1_start, preference1_end,
-                                    preference2_start, preference2_end, status)
-                VALUES (?, ?, ?, ?, ?, 'pending')
-            """, (p['id'], validated_slots[0][0].isoformat(), validated_slots[0][1].isoformat(),
-                  validated_slots[1][0].isoformat(), validated_slots[1][1].isoformat()))
-        elif len(validated_slots) == 3:
-            con.execute("""
-                INSERT INTO bookings (participant_id, preference1_start, preference1_end,
-                                    preference2_start, preference2_end,
-                                    preference3_start, preference3_end, status)
-                VALUES (?, ?, ?, ?, ?, ?, ?, 'pending')
-            """, (p['id'], validated_slots[0][0].isoformat(), validated_slots[0][1].isoformat(),
-                  validated_slots[1][0].isoformat(), validated_slots[1][1].isoformat(),
-                  validated_slots[2][0].isoformat(), validated_slots[2][1].isoformat()))
+        # Re-check blocks and confirmed bookings under the write lock so a slot
+        # taken since the availability check isn't requested
+        con.execute("BEGIN IMMEDIATE")
+        for start, end in validated_slots:
+            taken = con.execute("""
+                SELECT 1 FROM blocked_slots WHERE start_time = ? AND end_time = ?
+                UNION ALL
+                SELECT 1 FROM bookings
+                WHERE status = 'confirmed' AND selected_start_time < ? AND selected_end_time > ?
+                LIMIT 1
+            """, (start.isoformat(), end.isoformat(), end.isoformat(), start.isoformat())).fetchone()
+            if taken:
+                con.rollback()
+                return redirect(url_for("invite", token=token, error="Sorry, one of your selected slots was just taken."))
+        con.execute("""
+            INSERT INTO bookings (participant_id, preference1_start, preference1_end,
+                                preference2_start, preference2_end,
+                                preference3_start, preference3_end, status)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 'pending')
+        """, params)
 
     # Format times for display
-    slot_display = []
-    for i, (start, end) in enumerate(validated_slots, 1):
-        start_str = start.strftime('%a %b %d, %I:%M %p').replace(' 0', ' ')
-        end_str = end.strftime('%I:%M %p').replace(' 0', ' ')
-        slot_display.append(f"<strong>Option {i}:</strong> {start_str} – {end_str}")
-
-    slots_html = "<br>".join(slot_display)
-
-    confirmation_html = f"""
-    <!doctype html><meta charset='utf-8'>
-    <title>Booking Request Submitted</title>
-    <style>
-    body{{font-family:system-ui;max-width:600px;margin:40px auto;padding:20px;text-align:center}}
-    .pending{{background:#fef5e7;color:#92400e;padding:20px;border-radius:10px;margin:20px 0;border:2px solid #fbbf24}}
-    .info{{background:#e6fffa;color:#234e52;padding:15px;border-radius:8px;margin:15px 0}}
-    .next-steps{{background:#f0f9ff;color:#1e40af;padding:15px;border-radius:8px;margin:15px 0}}
-    </style>
-    <div class="pending">
-        <h2>⏳ Booking Request Submitted!</h2>
-        <p><strong>Your Time Slot Preferences:</strong><br>
-        {slots_html}<br><br>
-        (Toronto time)</p>
-    </div>
-    <div class="info">
-        📝 <strong>What happens next:</strong><br>
-        Your booking request with {len(validated_slots)} time slot preference(s) has been submitted and is pending admin approval.
-        The admin will select one of your preferred times.
-    </div>
-    <div class="next-steps">
-        ✅ <strong>Once approved by admin:</strong><br>
-        • You'll receive a Google Calendar invitation<br>
-        • The event will be added to your calendar<br>
-        • You'll get automatic email reminders<br>
-        • You'll receive a confirmation email
-    </div>
-    <div class="info">
-        🕒 <strong>Timeline:</strong> You can expect to hear back within 24 hours.
-    </div>
-    <p><a href='{url_for('invite', token=token)}'>← Back to Available Slots</a></p>
-    """
-    return confirmation_html
+    slot_display = [slot_labels(start.isoformat(), end.isoformat()) for start, end in validated_slots]
+    return render_template("booking_submitted.html", slots=slot_display, token=token)
 
 # ──────────────────────────────────────────────────────────────────────────────
 if __name__ == "__main__":
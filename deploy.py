@@ -5,10 +5,45 @@ This script creates a public deployment-ready version
 """
 
 import os
+import re
+import gzip
 import json
 import zipfile
 import shutil
 
+try:
+    import brotli  # optional: enables .br precompression
+except ImportError:
+    brotli = None
+
+def minify_css(css):
+    """Strip comments and insignificant whitespace from a stylesheet"""
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    return css.replace(';}', '}').strip()
+
+def precompress_static(static_dir):
+    """Minify CSS in place and write .gz (and .br) siblings; the app serves them to clients that accept them"""
+    for name in os.listdir(static_dir):
+        path = os.path.join(static_dir, name)
+        if name.endswith('.css'):
+            with open(path, encoding='utf-8') as f:
+                css = f.read()
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(minify_css(css))
+        if not name.endswith(('.css', '.js')):
+            continue
+        with open(path, 'rb') as f:
+            data = f.read()
+        with gzip.open(path + '.gz', 'wb', compresslevel=9) as f:
+            f.write(data)
+        if brotli:
+            with open(path + '.br', 'wb') as f:
+                f.write(brotli.compress(data, quality=11))
+        print(f"Precompressed static/{name}")
+
 def create_deployment_package():
     print("Creating deployment package...")
 
@@ -32,6 +67,14 @@ def create_deployment_package():
             shutil.copy2(file, deploy_dir)
             print(f"Copied {file}")
 
+    # Copy templates and static assets (CSS/JS referenced by the app)
+    for folder in ('templates', 'static'):
+        if os.path.isdir(folder):
+            shutil.copytree(folder, os.path.join(deploy_dir, folder))
+            print(f"Copied {folder}/")
+    if os.path.isdir(os.path.join(deploy_dir, 'static')):
+        precompress_static(os.path.join(deploy_dir, 'static'))
+
     # Create .env file for deployment with public URL
     env_content = """# Public deployment configuration
 CALENDAR_ID=cb65f60de536e08aa27bc8b12406ce8df101c5f51a4dcc87ddb67fcf3864afa1@group.calendar.google.com
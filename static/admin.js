@@ -0,0 +1,28 @@
+function addParticipant() {
+  const container = document.getElementById('participantsContainer');
+  const newRow = document.createElement('div');
+  newRow.className = 'participant-row';
+  newRow.innerHTML = `
+    <button type="button" class="remove-participant" onclick="removeParticipant(this)" title="Remove participant">×</button>
+    <div class="participant-fields">
+      <div class="form-group">
+        <label class="form-label">👤 Full Name</label>
+        <input name="names[]" class="form-input" required placeholder="Enter participant's full name">
+      </div>
+      <div class="form-group">
+        <label class="form-label">📧 Email Address</label>
+        <input type="email" name="emails[]" class="form-input" required placeholder="participant@email.com">
+      </div>
+    </div>
+  `;
+  container.appendChild(newRow);
+}
+
+function removeParticipant(button) {
+  const participantRows = document.querySelectorAll('.participant-row');
+  if (participantRows.length > 1) {
+    button.parentElement.remove();
+  } else {
+    alert('You must have at least one participant.');
+  }
+}
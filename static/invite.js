@@ -0,0 +1,77 @@
+let selectedSlots = [];
+const maxSlots = 3;
+
+function toggleSlot(start, end, element) {
+  const slotKey = start + '|' + end;
+  const index = selectedSlots.findIndex(slot => slot.key === slotKey);
+
+  if (index >= 0) {
+    // Deselect
+    selectedSlots.splice(index, 1);
+    element.classList.remove('selected');
+  } else {
+    // Select (if under limit)
+    if (selectedSlots.length >= maxSlots) {
+      alert('You can only select up to 3 time slots');
+      return;
+    }
+    selectedSlots.push({key: slotKey, start: start, end: end, element: element});
+    element.classList.add('selected');
+  }
+
+  updateDisplay();
+}
+
+function updateDisplay() {
+  const count = selectedSlots.length;
+  document.getElementById('slot-count').textContent = count;
+
+  const timesDiv = document.getElementById('selected-times');
+  if (count === 0) {
+    timesDiv.innerHTML = '';
+  } else {
+    const timeStrings = selectedSlots.map((slot, i) => {
+      const startDate = new Date(slot.start);
+      const endDate = new Date(slot.end);
+      const timeStr = startDate.toLocaleDateString('en-US', {weekday: 'short', month: 'short', day: 'numeric'}) +
+                     ' ' + startDate.toLocaleTimeString('en-US', {hour: 'numeric', minute: '2-digit'}) +
+                     '-' + endDate.toLocaleTimeString('en-US', {hour: 'numeric', minute: '2-digit'});
+      return `<div style="margin: 5px 0; padding: 5px; background: white; border-radius: 4px;">
+                <strong>Choice ${i+1}:</strong> ${timeStr}
+              </div>`;
+    });
+    timesDiv.innerHTML = timeStrings.join('');
+  }
+
+  const submitBtn = document.getElementById('submit-btn');
+  if (count > 0) {
+    submitBtn.disabled = false;
+    submitBtn.style.opacity = '1';
+    submitBtn.querySelector('div').textContent = `Submit ${count} time preference${count > 1 ? 's' : ''}`;
+  } else {
+    submitBtn.disabled = true;
+    submitBtn.style.opacity = '0.5';
+  }
+}
+
+function submitBooking() {
+  if (selectedSlots.length === 0) {
+    alert('Please select at least one time slot');
+    return;
+  }
+
+  const token = window.location.pathname.split('/').pop();
+  const params = new URLSearchParams({token});
+  // Availability version this page was rendered from
+  const version = document.querySelector('.calendar-grid').dataset.version;
+  if (version) params.append('v', version);
+
+  selectedSlots.forEach((slot, i) => {
+    params.append(`start${i+1}`, slot.start);
+    params.append(`end${i+1}`, slot.end);
+  });
+
+  const url = `/book?${params}`;
+  console.log('Submitting booking with URL:', url);
+  window.location.href = url;
+}